@@ -42,21 +42,28 @@
 #############################################################################
 
 from PyQt5.Qt import QTextOption
-from PyQt5.QtCore import (pyqtSignal, pyqtSlot, Q_ARG, QAbstractItemModel,
-                          QFileInfo, qFuzzyCompare, QMetaObject, QModelIndex, QObject, Qt,
-                          QThread, QTime, QUrl, QSize, QEvent, QCoreApplication)
-from PyQt5.QtGui import QColor, qGray, QImage, QPainter, QPalette, QIcon, QKeyEvent, QMouseEvent
+from PyQt5.QtCore import (pyqtSignal, pyqtSlot, Q_ARG, QAbstractItemModel, QAbstractTableModel,
+                          QFileInfo, qFuzzyCompare, QMetaObject, QModelIndex, QObject, QRect, QStandardPaths, Qt,
+                          QThread, QTimer, QUrl, QSize, QEvent, QCoreApplication)
+from PyQt5.QtGui import (QBrush, QColor, qGray, QImage, QPainter, QPalette, QIcon, QKeyEvent, QKeySequence,
+                         QMouseEvent, QRegion)
 from PyQt5.QtMultimedia import (QAbstractVideoBuffer, QMediaContent,
                                 QMediaMetaData, QMediaPlayer, QMediaPlaylist, QVideoFrame, QVideoProbe)
 from PyQt5.QtMultimediaWidgets import QVideoWidget
 from PyQt5.QtWidgets import (QApplication, QComboBox, QDialog, QFileDialog,
                              QFormLayout, QHBoxLayout, QLabel, QListView, QMessageBox, QPushButton,
-                             QSizePolicy, QSlider, QStyle, QToolButton, QVBoxLayout, QWidget, QLineEdit, QPlainTextEdit,
-                             QTableWidget, QTableWidgetItem, QSplitter, QAbstractItemView, QStyledItemDelegate, QHeaderView, QFrame, QProgressBar, QCheckBox, QToolTip, QGridLayout)
+                             QSizePolicy, QSlider, QStyle, QStyleOptionViewItem, QToolButton, QVBoxLayout, QWidget, QLineEdit, QPlainTextEdit,
+                             QTableView, QSplitter, QAbstractItemView, QStyledItemDelegate, QHeaderView, QFrame, QProgressBar, QCheckBox, QToolTip, QGridLayout)
+from functools import partial
 from io import TextIOWrapper
-import re
 from inspect import currentframe
+import os
 import numpy as np
+import SRTCore
+from SRTCore import (AutosaveJournal, CueStore, EditJournal, alignCueStarts, cueCacheName, formatSRTChunks,
+                     linearSync, parseScale, parseSRTBatches, readCueCache, readCueStore, readMappedCueStore,
+                     readParallelCueStore, setCueCachePosition, tstampsToStr, validCues, writeCueCache,
+                     writeSRTFile)
 
 
 def get_linenumber():
@@ -350,88 +357,529 @@ class Player(QWidget):  # forward declaration
     pass
 
 
-class SubDataTableWidget(QTableWidget):
+class SubDataTableWidget(QTableView):
     pass
 
 
-class SRTData(QThread):
+class SubDataTableModel(QAbstractTableModel):
+    """
+    Table model serving subtitle cues straight from a CueStore.
+
+    Rows highlighted as playing or overlapping are kept as row sets that the
+    table's delegate reads at paint time; changes to them are announced with
+    rowsRestyled instead of dataChanged, so only those rows get repainted.
+    """
+    rowsRestyled = pyqtSignal(object)  # rows whose highlight changed
+
+    Start, Stop, Text, ColumnCount = range(4)
+    HeaderLabels = ['Start', 'Stop', 'Text']
+    BlockSize = 256  # rows of timestamps formatted together
+    ActiveColor = QColor(0xfc9803)
+    BadColor = QColor('red')
+
+    def __init__(self, cues: CueStore, parent=None):
+        super(SubDataTableModel, self).__init__(parent)
+
+        self.m_cues = cues
+        self.m_activeRows = set()
+        self.m_badRows = set()
+        self.m_tstampText = {}  # block -> (start strings, stop strings)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.m_cues) if not parent.isValid() else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return self.ColumnCount if not parent.isValid() else 0
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            if index.column() == self.Start or index.column() == self.Stop:
+                return self.tstampText(row, index.column())
+            elif index.column() == self.Text:
+                return self.m_cues.text(row)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HeaderLabels[section] if 0 <= section < self.ColumnCount else None
+        return section + 1
+
+    def flags(self, index):
+        # editable so that the delegate gets to hand the cue to the input boxes
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable
+
+    def tstampText(self, row: int, column: int) -> str:
+        block, offset = divmod(row, self.BlockSize)
+        text = self.m_tstampText.get(block)
+        if text is None:
+            start = block * self.BlockSize
+            stop = start + self.BlockSize
+            text = (tstampsToStr(self.m_cues.starts[start:stop]),
+                    tstampsToStr(self.m_cues.stops[start:stop]))
+            self.m_tstampText[block] = text
+        return text[column - self.Start][offset]
+
+    def cues(self):
+        return self.m_cues
+
+    def setCues(self, cues: CueStore):
+        self.beginResetModel()
+        self.m_cues = cues
+        self.m_tstampText = {}
+        self.m_activeRows = set()
+        self.m_badRows = set()
+        self.endResetModel()
+
+    def setActiveRows(self, rows) -> set:
+        """
+        Set the rows highlighted as playing, returns the newly highlighted ones.
+        """
+        old = self.m_activeRows
+        self.m_activeRows = self.updateRowSet(old, rows)
+        return self.m_activeRows - old
+
+    def setBadRows(self, rows):
+        self.m_badRows = self.updateRowSet(self.m_badRows, rows)
+
+    def updateRowSet(self, old: set, rows) -> set:
+        new = set(rows)
+        changed = old ^ new
+        if len(changed) > 0:
+            self.rowsRestyled.emit(changed)
+        return new
+
+    def rowColor(self, row: int):
+        """
+        Get the highlight colour of row, None if it has none.
+        """
+        if row in self.m_activeRows:
+            return self.ActiveColor
+        elif row in self.m_badRows:
+            return self.BadColor
+        return None
+
+    def beginInsertItems(self, start, end):
+        self.beginInsertRows(QModelIndex(), start, end)
+        self.m_tstampText = {}
+        count = end - start + 1
+        self.m_activeRows = {r if r < start else r + count for r in self.m_activeRows}
+        self.m_badRows = {r if r < start else r + count for r in self.m_badRows}
+
+    def endInsertItems(self):
+        self.endInsertRows()
+
+    def beginRemoveItems(self, start, end):
+        self.beginRemoveRows(QModelIndex(), start, end)
+        self.m_tstampText = {}
+        count = end - start + 1
+        self.m_activeRows = {r if r < start else r - count for r in self.m_activeRows
+                             if r < start or r > end}
+        self.m_badRows = {r if r < start else r - count for r in self.m_badRows
+                          if r < start or r > end}
+
+    def endRemoveItems(self):
+        self.endRemoveRows()
+
+    def beginResetItems(self):
+        self.beginResetModel()
+
+    def endResetItems(self):
+        self.m_tstampText = {}
+        self.m_activeRows = set()
+        self.m_badRows = set()
+        self.endResetModel()
+
+    def changeItems(self, start, end, firstColumn=0, lastColumn=ColumnCount - 1):
+        if start > end or end < 0:
+            return
+        if firstColumn <= self.Stop and lastColumn >= self.Start:
+            self.m_tstampText = {}
+        self.dataChanged.emit(self.index(start, firstColumn),
+                              self.index(end, lastColumn))
+
+
+class SRTWriter(QThread):
+    """
+    Save a snapshot of subtitle data to a SubRip file in the background.
+
+    With a cache directory the saved file is cached too, see CueCacheWriter.
+    """
+    complete = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, cues: CueStore, fileName: str, cacheDirectory: str = None, position: int = -1):
+        super(SRTWriter, self).__init__()
+        # copies, so that the store can be edited while saving
+        self.starts = cues.starts.copy()
+        self.stops = cues.stops.copy()
+        self.texts = cues.texts.copy()
+        self.fileName = fileName
+        self.cacheDirectory = cacheDirectory
+        self.position = position
+        self.cacheName = None
+
+    def run(self):
+        try:
+            writeSRTFile(self.fileName, self.starts, self.stops, self.texts)
+        except Exception as e:
+            self.error.emit('storeSRT(): %s' % (str(e)))
+            return
+        if self.cacheDirectory is not None:
+            try:
+                self.cacheName = cueCacheName(self.cacheDirectory, self.fileName)
+                writeCueCache(self.cacheName, self.starts, self.stops, self.texts, self.position)
+            except Exception as e:
+                self.cacheName = None
+                print('storeSRT(): not cached: %s' % (str(e)))
+        self.complete.emit(self.fileName)
+
+
+class CueCacheWriter(QThread):
+    """
+    Write a snapshot of subtitle data loaded from a SubRip file to the cue
+    cache in the background, so that the file opens at once next time.
+    """
+
+    def __init__(self, cues: CueStore, cacheName: str):
+        super(CueCacheWriter, self).__init__()
+        self.starts = cues.starts.copy()
+        self.stops = cues.stops.copy()
+        self.texts = cues.texts.copy()
+        self.cacheName = cacheName
+
+    def run(self):
+        try:
+            writeCueCache(self.cacheName, self.starts, self.stops, self.texts)
+        except Exception as e:
+            print('loadSRT(): not cached: %s' % (str(e)))
+
+
+class SRTLoader(QThread):
+    """
+    Parse a SubRip file into a private cue store in the background.
+
+    With progressive set the cues are sent in batches as they are parsed
+    instead, the first one as soon as it fills a screen. With mapped set the
+    file is memory-mapped, scanned by LoadJobs worker processes if more than
+    one, and the cue texts are only decoded once used.
+
+    With a cache directory, a cache of the file contents written before is
+    read instead of parsing the file at all, and cached is set.
+    """
+    progress = pyqtSignal(int)
+    batch = pyqtSignal(object, object, object)  # starts, stops, texts of valid cues, in file order
+    loaded = pyqtSignal(object, int)  # CueStore (None if progressive and not cached), number of entries skipped
+    error = pyqtSignal(str)
+
+    FirstBatch = 256
+    BatchInterval = 0.1  # seconds
+    # worker processes scanning a mapped file; one, no pool, until a pool is measured to be faster (it was
+    # slower on one core, and every spawned worker imports this module with PyQt5 again)
+    LoadJobs = 1
+
+    def __init__(self, fileName: str, progressive: bool = False, mapped: bool = False, cacheDirectory: str = None):
+        super(SRTLoader, self).__init__()
+        self.fileName = fileName
+        self.progressive = progressive
+        self.mapped = mapped
+        self.cacheDirectory = cacheDirectory
+        self.cacheName = None  # cache file for the contents of fileName
+        self.cached = False
+        self.position = -1  # playback position stored with the cache
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def isCancelled(self) -> bool:
+        return self.cancelled
+
+    def run(self):
+        if self.cacheDirectory is not None:
+            try:
+                self.cacheName = cueCacheName(self.cacheDirectory, self.fileName)
+                result = readCueCache(self.cacheName)
+            except OSError:
+                result = None  # reported by the load below
+            if result is not None:
+                cues, self.position = result
+                self.cached = True
+                if not self.cancelled:
+                    self.loaded.emit(cues, 0)
+                return
+        try:
+            if self.mapped:
+                result = readParallelCueStore(self.fileName, self.LoadJobs, self.progress.emit, self.isCancelled)
+            else:
+                with open(self.fileName, 'r', encoding='utf-8') as stream:
+                    if self.progressive:
+                        result = self.readBatches(stream)
+                    else:
+                        result = readCueStore(stream, self.progress.emit, self.isCancelled)
+        except Exception as e:
+            self.error.emit('loadSRT(): %s' % (str(e)))
+            return
+        if result is not None and not self.cancelled:
+            self.loaded.emit(*result)
+
+    def readBatches(self, stream: TextIOWrapper):
+        dropped = 0
+        for starts, stops, texts in parseSRTBatches(stream, self.progress.emit, cancelled=self.isCancelled,
+                                                    firstBatch=self.FirstBatch, batchInterval=self.BatchInterval):
+            starts, stops, texts, skipped = validCues(starts, stops, texts)
+            dropped += skipped
+            if len(texts) > 0:
+                self.batch.emit(starts, stops, texts)
+        if self.cancelled:
+            return None
+        return None, dropped
+
+
+class SRTData(QObject):
     """
     Create a new subtitle data storage with associated display table
     """
     progress = pyqtSignal(int)
     complete = pyqtSignal()
+    saved = pyqtSignal(str)
+    positionRestored = pyqtSignal(int)  # playback position stored with a cached SubRip file
+    autosaveError = pyqtSignal(str)  # emitted from the autosave thread when journalling stops working
+
+    UndoMemory = 16 * 1024 * 1024  # bytes of undo history kept
 
     def __init__(self, table: SubDataTableWidget, mainWindow: Player = None):
         super(SRTData, self).__init__()
-        self.rawdata = [[-1, -1, '']]
+        self.cues = CueStore()
+        self.model = SubDataTableModel(self.cues)
         self.table = table
         self.mainWindow = mainWindow
-        self.total_lines = -1
-        self.current_lines = 0
-        self.stream = None
-        self.tstampdata = None
-        if table.columnCount() != 3:
-            table.setColumnCount(3)
+        self.loader = None
+        self.loaders = []  # every running loader, cancelled ones included
+        self.loadReplaced = 0  # duplicates replaced by batches of the current load
+        self.writer = None
+        self.journal = EditJournal(self.UndoMemory)
+        self.autosave = None  # AutosaveJournal of the media file being subtitled
+        self.edits = 0  # edits and loads so far
+        self.savedEdits = 0  # edits and loads in the last SubRip file saved
+        self.writerEdits = 0
+        self.cacheDirectory = None  # cue cache of loaded and saved SubRip files, None to not cache
+        self.cacheName = None  # cache file of the SubRip file last loaded or saved
+        self.cacheWriter = None
+        if self.mainWindow is not None:
+            self.autosaveError.connect(self.mainWindow.showErrorMessage)
+        self.loadEdits = -1  # edits when the current load started into an empty table
+        self.saved.connect(self.markSaved)
+        table.setModel(self.model)
         self.updateDisplayTable()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    def loadSRTFile(self, fileName: str, progressive: bool = False, mapped: bool = False):
+        """
+        Load a SubRip file on a worker thread.
+
+        The worker parses into its own store, which is merged in on this
+        thread in one step once complete. With progressive set, the cues are
+        merged in batch by batch instead and the table can be used while the
+        rest of the file loads. With mapped set, the file is memory-mapped
+        and cue texts are decoded as they are used. A load still running is
+        cancelled and anything it has not delivered yet is dropped.
+        """
+        self.cancelLoad(False)
+        self.journal.clear()
+        self.storeCachePosition()
+        self.loadEdits = self.edits if len(self.cues) == 0 else -1
+        loader = SRTLoader(fileName, progressive, mapped, self.cacheDirectory)
+        # results of a replaced loader may already be queued, the slots check the sender
+        loader.progress.connect(partial(self.loadProgress, loader))
+        loader.batch.connect(partial(self.addLoadedBatch, loader))
+        loader.loaded.connect(partial(self.loadFinished, loader))
+        loader.error.connect(partial(self.loadFailed, loader))
+        loader.finished.connect(partial(self.loaders.remove, loader))
+        self.loaders.append(loader)
+        self.loader = loader
+        self.loadReplaced = 0
+        loader.start()
+
+    def cancelLoad(self, notify: bool = True):
+        """
+        Cancel the running load, if any. Cues already merged in are kept.
+        """
+        loader = self.loader
+        if loader is None:
+            return
+        self.loader = None
+        loader.cancel()
+        if notify:
+            self.updateDisplayTable(True)
+            self.complete.emit()
 
-    # def __del__(self):
-    #     self.wait()
+    def isLoading(self) -> bool:
+        return self.loader is not None
 
-    def loadSRT(self, stream: TextIOWrapper):
-        if stream is None:
-            raise IOError('SRTData::loadSRT(): Invalid Stream')
-        self.stream = stream
+    def loadProgress(self, loader: SRTLoader, percent: int):
+        if loader is self.loader:
+            self.progress.emit(percent)
 
-    def run(self):
-        stream = self.stream
-        self.total_lines = len(stream.readlines())
-        stream.seek(0, 0)
-        nextLineIsTS = False
-        nextLineIsData = False
-        data = None
-        datastr = ''
-        self.current_lines = 0
-        for line in stream:
-            self.current_lines += 1
-            self.progress.emit(
-                int(100 * (self.current_lines / self.total_lines)))
-            if nextLineIsTS and re.match('[0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9] --> [0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9]', line):
-                data = []
-                data.append(self.strToTstamp(line.split('-->')[0]))
-                data.append(self.strToTstamp(line.split('-->')[1]))
-                nextLineIsData = True
-                nextLineIsTS = False
-                datastr = ''
-                continue
-            elif nextLineIsData:
-                if line.strip() != '':
-                    datastr += line
-                else:
-                    data.append(datastr)
-                    if self.current_lines != self.total_lines and self.current_lines % 20:
-                        self.addItem(data[0], data[1], data[2], False)
-                    else:
-                        self.addItem(data[0], data[1], data[2], True)
-                    data = None
-                    nextLineIsData = False
-            elif re.match('^[0-9]*$', line):
-                nextLineIsTS = True
-                continue
-        stream.close()
-        self.current_lines = -1
+    def addLoadedBatch(self, loader: SRTLoader, starts, stops, texts: list):
+        """
+        Merge a batch of cues from a progressive load.
+        """
+        if loader is not self.loader:
+            return
+        n = len(self.cues)
+        if self.cues.isAppend(starts, replace=True):
+            self.model.beginInsertItems(n, n + len(texts) - 1)
+            self.cues.extend(starts, stops, texts)
+            self.model.endInsertItems()
+        else:
+            self.model.beginResetItems()
+            self.loadReplaced += self.cues.extend(starts, stops, texts, replace=True)
+            self.model.endResetItems()
+        if n == 0:  # lay out the first screen right away
+            self.updateDisplayTable(True)
+        else:
+            self.model.setBadRows(self.validateData())
+
+    def loadFinished(self, loader: SRTLoader, cues: CueStore, dropped: int):
+        if loader is not self.loader:
+            return
+        if cues is None:  # progressive, everything has been merged in already
+            self.loader = None
+            self.journal.clear()
+            self.cacheLoaded(loader)
+            self.edits += 1
+            self.snapshotAutosave()
+            dropped += self.loadReplaced
+            if dropped > 0:
+                print('Skipped %d invalid or duplicate subtitle entries' % (dropped))
+            self.updateDisplayTable(True)
+            self.complete.emit()
+        else:
+            self.cacheLoaded(loader, cues)
+            self.setLoadedCues(cues, dropped)
+            if loader.cached and loader.position >= 0:
+                self.positionRestored.emit(loader.position)
+
+    def cacheLoaded(self, loader: SRTLoader, cues: CueStore = None):
+        """
+        Remember the cache of a finished load, writing it first if the
+        table holds exactly the file contents. Call before the load counts
+        as an edit.
+        """
+        if loader.cached:
+            self.cacheName = loader.cacheName
+        elif loader.cacheName is not None and self.loadEdits == self.edits:
+            if self.cacheWriter is not None:
+                self.cacheWriter.wait()
+            self.cacheWriter = CueCacheWriter(self.cues if cues is None else cues, loader.cacheName)
+            self.cacheWriter.start()
+            self.cacheName = loader.cacheName
+        else:
+            self.cacheName = None
+
+    def storeCachePosition(self) -> None:
+        """
+        Store the playback position with the cache of the current SubRip file.
+        """
+        position = self.playbackPosition()
+        if self.cacheName is None or position < 0:
+            return
+        if self.cacheWriter is not None:
+            self.cacheWriter.wait()
+        try:
+            setCueCachePosition(self.cacheName, position)
+        except OSError as e:
+            print('Cue cache position not stored: %s' % (str(e)))
+
+    def playbackPosition(self) -> int:
+        if self.mainWindow is None:
+            return -1
+        return self.mainWindow.player.position()
+
+    def setLoadedCues(self, cues: CueStore, dropped: int = 0):
+        """
+        Take over a store filled by a loader, merging it with the current one.
+        Loading can not be undone, the edit history starts over.
+        """
+        self.loader = None
+        self.journal.clear()
+        if len(self.cues) == 0:
+            self.cues = cues
+            self.model.setCues(cues)
+        else:
+            self.model.beginResetItems()
+            dropped += self.cues.extend(cues.starts, cues.stops, cues.texts, replace=True)
+            self.model.endResetItems()
+        if dropped > 0:
+            print('Skipped %d invalid or duplicate subtitle entries' % (dropped))
+        self.edits += 1
+        self.snapshotAutosave()
+        self.updateDisplayTable(True)
         self.complete.emit()
 
+    def loadFailed(self, loader: SRTLoader, msg: str):
+        if loader is not self.loader:
+            return
+        self.loader = None
+        print(msg)
+        if self.mainWindow is not None:
+            self.mainWindow.showErrorMessage(msg)
+        self.complete.emit()
+
+    def readSRT(self, stream: TextIOWrapper):
+        """
+        Load SubRip data from stream on the calling thread.
+        """
+        if stream is None:
+            raise IOError('SRTData::readSRT(): Invalid Stream')
+        self.setLoadedCues(*readCueStore(stream, self.progress.emit))
+
+    def shutdown(self):
+        """
+        Stop background work before the application exits.
+        """
+        self.cancelLoad(False)
+        for loader in list(self.loaders):
+            loader.wait()
+        if self.writer is not None:
+            self.writer.wait()
+        self.storeCachePosition()
+        if self.cacheWriter is not None:
+            self.cacheWriter.wait()
+        self.stopAutosave()
+
     def storeSRT(self, stream: TextIOWrapper):
         if stream is None:
             if self.mainWindow is not None:
                 self.mainWindow.showErrorMessage('LoadSRT: Stream is None')
             return
-        for idx, data in enumerate(self.rawdata):
-            stream.write('%d\n' % (idx + 1))
-            stream.write('%s --> %s\n' %
-                         (self.tstampToStr(data[0]), self.tstampToStr(data[1])))
-            stream.write('%s\n' % (data[2]))
-            stream.write('\n')
+        for chunk in formatSRTChunks(self.cues.starts, self.cues.stops, self.cues.texts):
+            stream.write(chunk)
+
+    def storeSRTFile(self, fileName: str):
+        """
+        Save the subtitle data to fileName on a worker thread.
+
+        The data is copied first, the file is replaced atomically and the
+        saved signal is emitted once it is on disk.
+        """
+        if self.writer is not None:
+            self.writer.wait()  # one save at a time
+        self.writer = SRTWriter(self.cues, fileName, self.cacheDirectory, self.playbackPosition())
+        self.writerEdits = self.edits
+        self.writer.complete.connect(self.saved)
+        if self.mainWindow is not None:
+            self.writer.error.connect(self.mainWindow.showErrorMessage)
+        else:
+            self.writer.error.connect(print)
+        self.writer.start()
 
     def addItem(self, start: int, stop: int, text: str, updateStuff: bool = True):
         """
@@ -457,56 +905,277 @@ class SRTData(QThread):
         text = text.strip()
         if len(text) == 0:
             return
-        if self.rawdata == [[-1, -1, '']]:
-            self.rawdata = []
-        if self.tstampdata is not None:
-            # check if timestamp already in
-            idx = np.where((self.tstampdata[0] == start) & (self.tstampdata[1] == stop))[0]
-            for i in idx:
-                del self.rawdata[i]
-        self.rawdata.append([start, stop, text])
+        replaced = self.replaceCue(start, stop, text)
+        self.recordEdit(('insert', start, stop, text, replaced))
         if updateStuff:
-            self.rawdata.sort(key=self.getSortKey)
             self.updateDisplayTable(True)
-            startdata = [d[0] for d in self.rawdata]
-            enddata = [d[1] for d in self.rawdata]
-            self.tstampdata = np.asarray([startdata, enddata])
+        return
+
+    def addItems(self, starts: list, stops: list, texts: list):
+        """
+        Add subtitle entries in bulk, sorting and updating the table once.
+        Like addItem, an entry replaces any with the same start and stop.
+
+        Parameters:
+            starts (list): Starting positions of subtitle texts in milliseconds
+            stops (list): Stopping positions of subtitle texts in milliseconds
+            texts (list): Subtitle texts
+        """
+        validStarts, validStops, validTexts, dropped = validCues(starts, stops, texts)
+        rows = self.cues.matchRows(validStarts, validStops)
+        replaced = (self.cues.starts[rows], self.cues.stops[rows], [self.cues.text(row) for row in rows.tolist()])
+        dropped += self.extendCues(validStarts, validStops, validTexts)
+        self.recordEdit(('bulk', validStarts, validStops, list(validTexts)) + replaced)
+        if dropped > 0:
+            print('Skipped %d invalid or duplicate subtitle entries' % (dropped))
+        self.updateDisplayTable(True)
         return
 
     def deleteItem(self, row: int):
-        try:
-            del self.rawdata[row]
-            self.rawdata.sort(key=self.getSortKey)
-            self.updateDisplayTable(True)
-            startdata = [d[0] for d in self.rawdata]
-            enddata = [d[1] for d in self.rawdata]
-            self.tstampdata = np.asarray([startdata, enddata])
-        except Exception:
+        if row < 0 or row >= len(self.cues):
             return
+        self.recordEdit(('delete',) + self.cues.item(row))
+        self.removeCues([row])
+        self.updateDisplayTable(True)
 
     def addOffset(self, milliseconds: int) -> None:
-        try:
-            start = self.rawdata[0][0]
-            if start < 0:
-                return
-        except Exception:
+        """
+        Move every subtitle entry by milliseconds, as an edit.
+        Raises ValueError, changing nothing, if a cue would start before 0.
+        """
+        if len(self.cues) == 0:
             return
-        for item in self.rawdata:
-            item[0] += milliseconds
-            item[1] += milliseconds
-        self.rawdata.sort(key=self.getSortKey)
+        if self.cues.starts[0] + milliseconds < 0:
+            raise ValueError('Offset moves subtitle 1 to -%s, before the start' % (
+                self.tstampToStr(-int(self.cues.starts[0] + milliseconds))))
+        self.shiftCues(milliseconds)
+        self.recordEdit(('offset', milliseconds))
         self.updateDisplayTable()
-        startdata = [d[0] for d in self.rawdata]
-        enddata = [d[1] for d in self.rawdata]
-        self.tstampdata = np.asarray([startdata, enddata])
         return
 
+    def retime(self, scale: float, offset: float, begin: int = None, end: int = None) -> None:
+        """
+        Re-time subtitle entries linearly, e.g. for a frame rate conversion.
+
+        Parameters:
+            scale (float): Factor applied to every start and stop time (positive)
+            offset (float): Milliseconds added after scaling
+            begin (int): Only re-time entries starting at or after this (ms)
+            end (int): Only re-time entries starting before this (ms)
+        """
+        first, last = self.cues.startRows(begin, end)
+        if first < last:
+            self.setRetimed(first, *self.cues.retimed(scale, offset, first, last))
+
+    def warp(self, anchors, targets, begin: int = None, end: int = None) -> None:
+        """
+        Re-time subtitle entries piecewise linearly, see SRTCore.warpTimes.
+
+        Parameters:
+            anchors: Increasing times (ms) to move
+            targets: Increasing times (ms) to move the anchors to
+            begin (int): Only re-time entries starting at or after this (ms)
+            end (int): Only re-time entries starting before this (ms)
+        """
+        first, last = self.cues.startRows(begin, end)
+        if first < last:
+            self.setRetimed(first, *self.cues.warped(anchors, targets, first, last))
+
+    def alignTo(self, reference: CueStore, piecewise: bool = True) -> tuple:
+        """
+        Re-time the subtitle entries to best match the start times of a
+        reference, e.g. the cues of another SRTData, see SRTCore.alignCueStarts.
+
+        Returns:
+            (anchors, targets): The warp applied, raises ValueError if none was found
+        """
+        anchors, targets = alignCueStarts(self.cues.starts, reference.starts, piecewise)
+        self.warp(anchors, targets)
+        return anchors, targets
+
+    def setRetimed(self, first: int, starts, stops) -> None:
+        """
+        Set times computed by CueStore.retimed or CueStore.warped, as an edit.
+        Raises ValueError, changing nothing, if a cue would start before 0.
+        """
+        if len(starts) > 0 and starts.min() < 0:
+            row = first + int(np.argmin(starts))
+            raise ValueError('Re-timing moves subtitle %d to -%s, before the start' % (
+                row + 1, self.tstampToStr(-int(starts.min()))))
+        last = first + len(starts)
+        entry = ('retime', self.cues.starts[first:last].copy(), self.cues.stops[first:last].copy(), starts, stops)
+        self.moveCues(*entry[1:])
+        self.recordEdit(entry)
+        self.updateDisplayTable()
+
+    def setText(self, row: int, text: str) -> None:
+        """
+        Replace the text of the subtitle entry at row.
+        """
+        text = text.strip()
+        if row < 0 or row >= len(self.cues) or len(text) == 0:
+            return
+        start, stop, oldText = self.cues.item(row)
+        self.recordEdit(('text', start, stop, oldText, text))
+        self.setCueText(row, text)
+
+    def undo(self) -> bool:
+        """
+        Undo the latest edit, returns False if there was none.
+        """
+        entry = self.journal.undo()
+        if entry is None:
+            return False
+        self.applyEdit(entry, True)
+        return True
+
+    def redo(self) -> bool:
+        """
+        Apply the latest undone edit again, returns False if there was none.
+        """
+        entry = self.journal.redo()
+        if entry is None:
+            return False
+        self.applyEdit(entry, False)
+        return True
+
+    def applyEdit(self, entry: tuple, inverse: bool) -> None:
+        """
+        Apply an edit history entry (see EditJournal), or its inverse.
+        """
+        EditJournal.apply(self, entry, inverse)
+        self.logEdit(entry, inverse)
+        self.updateDisplayTable(True)
+
+    def recordEdit(self, entry: tuple) -> None:
+        """
+        Add an edit just made to the undo history and the autosave journal.
+        """
+        self.journal.record(entry)
+        self.logEdit(entry, False)
+
+    def logEdit(self, entry: tuple, inverse: bool) -> None:
+        self.edits += 1
+        if self.autosave is None:
+            return
+        self.autosave.append(entry, inverse)
+        if self.autosave.needsSnapshot():
+            self.snapshotAutosave()
+
+    def startAutosave(self, fileName: str) -> None:
+        """
+        Journal every edit to fileName from now on, starting from the
+        current cues. Replaces the file, see recoverAutosave.
+        """
+        self.stopAutosave()
+        self.autosave = AutosaveJournal(fileName, self.autosaveError.emit)
+        self.snapshotAutosave()
+
+    def snapshotAutosave(self) -> None:
+        if self.autosave is not None:
+            self.autosave.snapshot(self.cues.starts.copy(), self.cues.stops.copy(), self.cues.texts.copy())
+
+    def stopAutosave(self) -> None:
+        """
+        Stop journalling. The file is kept if there are edits that have not
+        been saved to a SubRip file since.
+        """
+        if self.autosave is not None:
+            self.autosave.close(remove=not self.isModified())
+            self.autosave = None
+
+    def recoverAutosave(self, fileName: str) -> bool:
+        """
+        Replace the cues with the ones recorded in an autosave journal.
+        Returns False if it holds nothing to recover.
+        """
+        try:
+            recovered = AutosaveJournal.recover(fileName)
+        except Exception as e:
+            msg = 'Could not recover %s: %s' % (fileName, str(e))
+            print(msg)
+            if self.mainWindow is not None:
+                self.mainWindow.showErrorMessage(msg)
+            return False
+        if recovered is None:
+            return False
+        cues, edits = recovered
+        self.cancelLoad(False)
+        self.journal.clear()
+        self.cues = cues
+        self.model.setCues(cues)
+        self.edits += 1
+        print('Recovered %d subtitle entries, %d edits replayed' % (len(cues), edits))
+        self.updateDisplayTable(True)
+        return True
+
+    def isModified(self) -> bool:
+        """
+        Check for edits or loads since the last save to a SubRip file.
+        """
+        return self.edits != self.savedEdits
+
+    def markSaved(self, fileName: str) -> None:
+        self.savedEdits = self.writerEdits
+        if self.writer is not None and self.writer.cacheName is not None:
+            self.cacheName = self.writer.cacheName
+
+    # edits without history, keeping the table model in step
+    def replaceCue(self, start: int, stop: int, text: str) -> list:
+        """
+        Insert a cue, removing any with the same start and stop first.
+        Returns the texts of the removed ones.
+        """
+        rows = self.cues.findRows(start, stop)
+        replaced = [self.cues.text(row) for row in rows.tolist()]
+        self.removeCues(rows)
+        row = self.cues.insertionRow(start)
+        self.model.beginInsertItems(row, row)
+        self.cues.insert(start, stop, text)
+        self.model.endInsertItems()
+        return replaced
+
+    def removeCues(self, rows) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 1:
+            row = int(rows[0])
+            self.model.beginRemoveItems(row, row)
+            self.cues.remove(row)
+            self.model.endRemoveItems()
+        elif len(rows) > 1:
+            self.model.beginResetItems()
+            self.cues.removeRows(rows)
+            self.model.endResetItems()
+
+    def extendCues(self, starts, stops, texts) -> int:
+        self.model.beginResetItems()
+        replaced = self.cues.extend(starts, stops, texts, replace=True)
+        self.model.endResetItems()
+        return replaced
+
+    def shiftCues(self, milliseconds: int) -> None:
+        self.cues.shift(milliseconds)
+        self.model.changeItems(0, len(self.cues) - 1,
+                               SubDataTableModel.Start, SubDataTableModel.Stop)
+
+    def moveCues(self, fromStarts, fromStops, starts, stops) -> None:
+        rows = self.cues.moveCues(fromStarts, fromStops, starts, stops)
+        if rows is None:  # re-sorted
+            self.model.beginResetItems()
+            self.model.endResetItems()
+        elif len(rows) > 0:
+            self.model.changeItems(int(rows[0]), int(rows[-1]), SubDataTableModel.Start, SubDataTableModel.Stop)
+
+    def setCueText(self, row: int, text: str) -> None:
+        self.cues.setText(row, text)
+        self.model.changeItems(row, row, SubDataTableModel.Text, SubDataTableModel.Text)
+
     def getItem(self, index: int) -> list:
         """
         Get the subtitle data at index.
         """
-        if index >= 0 and index < len(self.rawdata):
-            return self.rawdata[index]
+        if index >= 0 and index < len(self.cues):
+            return list(self.cues.item(index))
         else:
             return []
 
@@ -514,29 +1183,14 @@ class SRTData(QThread):
         """
         Get the number of subtitle items in the store.
         """
-        return len(self.rawdata)
+        return len(self.cues)
 
     def updateDisplayTable(self, init: bool = False):
         """
-        Update the associated display table.
-        """
-        datalen = len(self.rawdata)
-        if datalen != self.table.rowCount():
-            self.table.setRowCount(datalen)
-        for i, data in enumerate(self.rawdata):
-            data = self.rawdata[i]
-            self.table.setItem(i, 0, QTableWidgetItem(
-                self.tstampToStr(data[0])))  # start
-            self.table.setItem(i, 1, QTableWidgetItem(
-                self.tstampToStr(data[1])))  # stop
-            self.table.setItem(i, 2, QTableWidgetItem(data[2]))  # text
-        badIndex = self.validateData()
-        for idx in badIndex:
-            self.table.item(idx, 0).setBackground(QColor('red'))
-            self.table.item(idx, 1).setBackground(QColor('red'))
-            self.table.item(idx, 2).setBackground(QColor('red'))
-        self.table.resizeColumnsToContents()
-        self.table.resizeRowsToContents()
+        Update the overlap highlighting and layout of the associated display table.
+        """
+        self.model.setBadRows(self.validateData())
+        # a SubDataTableWidget sizes its rows and columns as they change
         self.table.horizontalHeader().setStretchLastSection(True)
         return
 
@@ -558,67 +1212,104 @@ class SRTData(QThread):
             print(errStr)
             return
         else:
-            for idx, data in enumerate(self.rawdata):
-                stream.write(self.dataToLine(idx, data))
+            starts = tstampsToStr(self.cues.starts)
+            stops = tstampsToStr(self.cues.stops)
+            for idx, text in enumerate(self.cues.texts):
+                stream.write(self.dataToLine(idx, (starts[idx], stops[idx], text)))
         return
 
     # privates
     @staticmethod
     def tstampToStr(currentInfo: int) -> str:
-        if currentInfo < 0:
-            return '--:--:--,---'
-        currentInfo /= 1000.0
-        currentTime = QTime((int(currentInfo)//3600) % 60, (int(currentInfo)//60) % 60,
-                            int(currentInfo) % 60, int(currentInfo*1000) % 1000)
-        format = 'hh:mm:ss,zzz'
-        return currentTime.toString(format)
+        return SRTCore.tstampToStr(currentInfo)
 
     def strToTstamp(self, currentStr: str) -> int:
-        currentStr = currentStr.strip()
-        if re.match('[0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9]', currentStr) is None:
+        val = SRTCore.strToTstamp(currentStr)
+        if val < 0:
             # error
-            print('%s is not a valid timestamp string' % (currentStr))
+            print('%s is not a valid timestamp string' % (currentStr.strip()))
             if self.mainWindow is not None:
                 self.mainWindow.showErrorMessage(
-                    '%s is not a valid timestamp string' % (currentStr))
-            return -1
-        val = int(currentStr[0:2]) * 3600 + int(currentStr[3:5]
-                                                ) * 60 + int(currentStr[6:8])  # hh:mm:ss to ss
-        val *= 1000  # ss to ms
-        val += int(currentStr[-3:])
+                    '%s is not a valid timestamp string' % (currentStr.strip()))
         return val
 
-    def getSortKey(self, val: list) -> int:
-        try:
-            out = val[0]
-        except Exception as e:
-            msg = 'Error accessing object 0 of list %s, error %s' % (
-                str(val), str(e))
-            print(msg)
-            if self.mainWindow is not None:
-                self.mainWindow.showErrorMessage(
-                    '%s is not a valid timestamp string' % (msg))
-            return -1
-        return out
-
     def validateData(self) -> list:
-        datalen = len(self.rawdata)
-        retval = []
-        for i in range(datalen):
-            if i > 0 and self.rawdata[i][0] < self.rawdata[i - 1][1]:
-                retval.append(i - 1)
-                retval.append(i)
-        retval = list(set(retval))
-        return retval
-
-    def dataToLine(self, idx: int, data: list) -> str:
+        """
+        Get the rows of subtitle entries overlapping a neighbour.
+        """
+        return self.cues.badRows()
+
+    def dataToLine(self, idx: int, data) -> str:
+        """
+        Format a subtitle entry, timestamps may be given preformatted.
+        """
+        start, stop = data[0], data[1]
         output = '%d\n' % (idx)
-        output += '%s --> %s\n' % (self.tstampToStr(
-            data[0]), self.tstampToStr(data[1]))
+        output += '%s --> %s\n' % (start if isinstance(start, str) else self.tstampToStr(start),
+                                    stop if isinstance(stop, str) else self.tstampToStr(stop))
         output += '%s\n\n' % (data[2])
         return output
 
 
+class CueScheduler(QObject):
+    """
+    Emits boundary with the player position whenever playback reaches the
+    start or end of a cue, using a single timer armed for the next boundary
+    instead of polling the position. Re-armed on seeks, state and rate
+    changes, and edits of the subtitle data.
+    """
+    boundary = pyqtSignal(int)
+
+    MinDelay = 10  # ms, keeps a stalled player from spinning the timer
+
+    def __init__(self, player: QMediaPlayer, subtitleData, parent=None):
+        super(CueScheduler, self).__init__(parent)
+        self.player = player
+        self.subtitleData = subtitleData
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.boundaryReached)
+        # coalesces the model signals of an edit into one refresh
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.setSingleShot(True)
+        self.refreshTimer.setInterval(0)
+        self.refreshTimer.timeout.connect(self.boundaryReached)
+
+        player.positionChanged.connect(self.schedule)
+        player.stateChanged.connect(self.reschedule)
+        player.playbackRateChanged.connect(self.reschedule)
+        model = subtitleData.model
+        model.modelReset.connect(self.refreshTimer.start)
+        model.rowsInserted.connect(self.refreshTimer.start)
+        model.rowsRemoved.connect(self.refreshTimer.start)
+        model.dataChanged.connect(self.refreshTimer.start)
+
+    def reschedule(self, *args):
+        self.schedule(self.player.position())
+
+    def schedule(self, position: int):
+        """
+        Arm the timer for the first cue boundary after position, if playing.
+        """
+        self.timer.stop()
+        if position is None or self.player.state() != QMediaPlayer.PlayingState:
+            return
+        boundary = self.subtitleData.cues.nextBoundary(position)
+        if boundary < 0:
+            return
+        rate = self.player.playbackRate()
+        if rate <= 0:
+            rate = 1.0
+        delay = int(np.ceil((boundary - position) / rate))
+        self.timer.start(max(delay, self.MinDelay))
+
+    def boundaryReached(self):
+        position = self.player.position()
+        self.boundary.emit(position)
+        self.schedule(position)
+
+
 class NumpadHelper(QObject):
     def __init__(self, parent=None):
         super(NumpadHelper, self).__init__(parent)
@@ -650,6 +1341,7 @@ class NumpadHelper(QObject):
                 self.m_widgets[0].subInputBox.setStyleSheet('background-color: #ffffff')
                 self.m_widgets[0].compensationInput.setStyleSheet('background-color: #ffffff')
                 self.m_widgets[0].subOffsetInputBox.setStyleSheet('background-color: #ffffff')
+                self.m_widgets[0].subScaleInputBox.setStyleSheet('background-color: #ffffff')
                 self.m_widgets[0].controls.rateBox.setStyleSheet('background-color: #ffffff')
                 self.m_widgets[0].subtitleDisplayTable.setStyleSheet('background-color: #f8f8f8')
 
@@ -711,11 +1403,13 @@ class NumpadHelper(QObject):
                 self.m_widgets[0].gotoNearestSubStart()
                 return True
             elif event.key() == Qt.Key_3 and numpad_mod:
+                self.m_widgets[0].gotoNextSub()
                 return True
             elif event.key() == Qt.Key_8 and numpad_mod:
                 self.m_widgets[0].gotoMarkStart()
                 return True
             elif event.key() == Qt.Key_0 and numpad_mod:
+                self.m_widgets[0].gotoPreviousSub()
                 return True
             elif event.key() == Qt.Key_Period and numpad_mod:
                 return True
@@ -731,37 +1425,162 @@ class NumpadHelper(QObject):
 
 
 class Delegate(QStyledItemDelegate):
+    def initStyleOption(self, option, index):
+        super(Delegate, self).initStyleOption(option, index)
+        color = index.model().rowColor(index.row())
+        if color is None:
+            return
+        if option.state & QStyle.State_Selected:
+            # keep playing and overlapping rows recognisable when selected
+            option.palette.setColor(QPalette.Highlight, color.darker(150))
+        else:
+            option.backgroundBrush = QBrush(color)
+
     def createEditor(self, parent, option, index):
         self.index = index
         self.parent = parent
         if index.column() == 2:
             # ed = super(Delegate, self).createEditor(parent, option, index)
-            start = self.parent.parent().subtitleData.rawdata[index.row()][0]
-            end = self.parent.parent().subtitleData.rawdata[index.row()][1]
-            text = self.parent.parent().subtitleData.rawdata[index.row()][2]
+            start, end, text = self.parent.parent().subtitleData.cues.item(index.row())
             self.parent.parent().parent.selectSub(start, end, text)
             return None
         else:
             return None
 
 
-class SubDataTableWidget(QTableWidget):
+class SubDataTableWidget(QTableView):
+    """
+    Subtitle table. Timestamp columns have a fixed width, and row heights
+    are measured when rows are first shown, cached per cue text for the
+    current text column width, and measured again only for rows whose text
+    changed or when the text column is resized.
+    """
+
+    TstampSample = '00:00:00,000'
+    MeasureMargin = 2  # viewports of rows measured beyond the visible ones
+
     def __init__(self, parent: Player, stream: TextIOWrapper = None):
         super(SubDataTableWidget, self).__init__(parent)
         self.parent = parent
         self.subtitleData = SRTData(self, parent)
         self.selectedItem = None
         self.numpadHelper = parent.numpadHelper
-        self.setHorizontalHeaderLabels(['Start', 'Stop', 'Text'])
-        self.resizeColumnsToContents()
-        self.resizeRowsToContents()
-        self.horizontalHeader().setStretchLastSection(True)
-        self.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.rowHeights = {}  # cue text -> row height at textWidth
+        self.rowMeasured = np.zeros(0, dtype=bool)
+        self.textWidth = -1
+        header = self.horizontalHeader()
+        header.setStretchLastSection(True)
+        header.setSectionResizeMode(SubDataTableModel.Text, QHeaderView.Stretch)
+        header.sectionResized.connect(self.columnResized)
         self.setSelectionBehavior(QAbstractItemView.SelectRows)
-        # self.setEditTriggers(QTableWidget.NoEditTriggers)
+        # self.setEditTriggers(QTableView.NoEditTriggers)
         self.clicked.connect(self.subTableSelectAction)
         self.delegate = Delegate(self)
         self.setItemDelegate(self.delegate)
+        self.setTstampColumnWidths()
+
+        # coalesces layout changes into one measurement of the visible rows
+        self.measureTimer = QTimer(self)
+        self.measureTimer.setSingleShot(True)
+        self.measureTimer.setInterval(0)
+        self.measureTimer.timeout.connect(self.measureVisibleRows)
+        # not start itself, valueChanged(int) would pick start(int msec) and set the interval
+        self.verticalScrollBar().valueChanged.connect(lambda: self.measureTimer.start())
+        model = self.subtitleData.model
+        model.rowsRestyled.connect(self.updateRows)
+        model.modelReset.connect(self.resetRowHeights)
+        model.rowsInserted.connect(self.rowsAdded)
+        model.rowsRemoved.connect(self.rowsDropped)
+        model.dataChanged.connect(self.rowsEdited)
+
+    def setTstampColumnWidths(self):
+        """
+        Size the start and stop columns for a timestamp, without looking at the rows.
+        """
+        option = self.viewOptions()
+        option.features |= QStyleOptionViewItem.HasDisplay
+        option.text = self.TstampSample
+        size = self.style().sizeFromContents(QStyle.CT_ItemViewItem, option, QSize(), self)
+        header = self.horizontalHeader()
+        for column in (SubDataTableModel.Start, SubDataTableModel.Stop):
+            header.setSectionResizeMode(column, QHeaderView.Fixed)
+            header.resizeSection(column, size.width() + (1 if self.showGrid() else 0))
+        self.verticalHeader().setDefaultSectionSize(size.height())
+
+    def resetRowHeights(self):
+        self.rowMeasured = np.zeros(self.subtitleData.model.rowCount(), dtype=bool)
+        self.measureTimer.start()
+
+    def rowsAdded(self, parent, first, last):
+        self.rowMeasured = np.insert(self.rowMeasured, first, np.zeros(last - first + 1, dtype=bool))
+        self.measureTimer.start()
+
+    def rowsDropped(self, parent, first, last):
+        self.rowMeasured = np.delete(self.rowMeasured, np.s_[first:last + 1])
+        self.measureTimer.start()
+
+    def rowsEdited(self, topLeft, bottomRight, roles=None):
+        if topLeft.column() <= SubDataTableModel.Text <= bottomRight.column():
+            self.rowMeasured[topLeft.row():bottomRight.row() + 1] = False
+            self.measureTimer.start()
+
+    def columnResized(self, column, oldWidth, newWidth):
+        if column == SubDataTableModel.Text and newWidth != self.textWidth:
+            self.rowMeasured[:] = False
+            self.measureTimer.start()
+
+    def measureVisibleRows(self):
+        """
+        Set the heights of the rows on and just below screen that have not
+        been measured since their text or the text column width changed.
+        """
+        count = min(len(self.rowMeasured), self.subtitleData.model.rowCount())
+        if count == 0:
+            return
+        width = self.columnWidth(SubDataTableModel.Text)
+        if width != self.textWidth:
+            self.textWidth = width
+            self.rowHeights = {}
+        option = self.viewOptions()
+        option.rect = QRect(0, 0, width, self.verticalHeader().defaultSectionSize())
+        header = self.verticalHeader()
+        model = self.subtitleData.model
+        cues = self.subtitleData.cues
+        row = max(self.rowAt(0), 0)
+        minHeight = header.sectionSizeHint(row)
+        grid = 1 if self.showGrid() else 0
+        limit = self.viewport().height() * (1 + self.MeasureMargin)
+        y = 0
+        while row < count and y < limit:
+            if not self.rowMeasured[row]:
+                text = cues.text(row)
+                height = self.rowHeights.get(text)
+                if height is None:
+                    height = self.delegate.sizeHint(option, model.index(row, SubDataTableModel.Text)).height()
+                    height = max(height + grid, minHeight)
+                    self.rowHeights[text] = height
+                if header.sectionSize(row) != height:
+                    header.resizeSection(row, height)
+                self.rowMeasured[row] = True
+            y += header.sectionSize(row)
+            row += 1
+
+    def resizeEvent(self, event):
+        super(SubDataTableWidget, self).resizeEvent(event)
+        self.measureTimer.start()
+
+    def updateRows(self, rows):
+        """
+        Repaint the visible ones of rows.
+        """
+        height = self.viewport().height()
+        region = QRegion()
+        for row in rows:
+            y = self.rowViewportPosition(row)
+            if y + self.rowHeight(row) > 0 and y < height:
+                region += QRect(0, y, self.viewport().width(), self.rowHeight(row))
+        if not region.isEmpty():
+            self.viewport().update(region)
 
     def setSubtitleData(self, subtitleData: SRTData):
         self.subtitleData = subtitleData
@@ -770,16 +1589,11 @@ class SubDataTableWidget(QTableWidget):
         key = event.key()
         if self.subtitleData is None:
             return
-        if key == Qt.Key_Return or key == Qt.Key_Enter and self.selectedItem is not None:
+        if (key == Qt.Key_Return or key == Qt.Key_Enter) and self.selectedItem is not None:
             # seek to point
             row = self.selectedItem.row()
-            col = self.selectedItem.column()
-            if col == 2:
-                # print(row, col)
-                self.subtitleData.rawdata[row][col] = self.item(
-                    row, col).text()
-            self.parent.player.setPosition(self.subtitleData.getItem(row)[0])
-            # print(self.subtitleData.rawdata)
+            if row < self.subtitleData.getNumItems():
+                self.parent.player.setPosition(self.subtitleData.getItem(row)[0])
         elif key == Qt.Key_Delete and self.selectedItem is not None:
             # delete data
             row = self.selectedItem.row()
@@ -787,7 +1601,6 @@ class SubDataTableWidget(QTableWidget):
             self.subtitleData.deleteItem(row)
         else:
             super(SubDataTableWidget, self).keyPressEvent(event)
-        self.subtitleData.updateDisplayTable()
 
     def subTableSelectAction(self, item):
         if self.subtitleData is None:
@@ -798,8 +1611,7 @@ class SubDataTableWidget(QTableWidget):
         self.parent.player.pause()
         self.parent.player.setPosition(self.subtitleData.getItem(row)[0])
         print('subTableSelectAction():', row, col,
-              self.subtitleData.rawdata[row][2])
-        self.subtitleData.updateDisplayTable()
+              self.subtitleData.cues.text(row))
 
     def addData(self, start: int, stop: int, text: str):
         if self.subtitleData is None:
@@ -810,6 +1622,12 @@ class SubDataTableWidget(QTableWidget):
 class Player(QWidget):
     fullScreenChanged = pyqtSignal(bool)
 
+    MappedLoadSize = 16 * 1024 * 1024  # bytes, larger SRT files are memory-mapped, see SRTLoader.LoadJobs
+    CueNavSlack = 250  # ms, previous/next cue steps from the last cue stepped to while within this of its start
+    PositionNotifyInterval = 1000  # ms, cue boundaries and the time display are timed separately
+    AutosaveSuffix = '.srt-autosave'  # subtitle edits are journalled to the media file name plus this
+    CueCacheDirectory = 'srtcache'  # loaded and saved SubRip files are cached here, below the cache location
+
     def __init__(self, playlist, parent=None):
         super(Player, self).__init__(parent)
 
@@ -826,13 +1644,12 @@ class Player(QWidget):
         self.numpadHelper = numpadHelper
 
         self.subStartPos = -1
+        self.cueNavTarget = None
         self.subEndPos = -1
 
-        self.loadSubProgress = None
-        self.loadSubProgressBar = None
 
         self.player = QMediaPlayer()
-        self.player.setNotifyInterval(10)
+        self.player.setNotifyInterval(self.PositionNotifyInterval)
 
         self.player.durationChanged.connect(self.durationChanged)
         self.player.positionChanged.connect(self.positionChanged)
@@ -885,6 +1702,7 @@ class Player(QWidget):
         controls.stop.connect(self.videoWidget.update)
 
         self.player.stateChanged.connect(controls.setState)
+        self.player.stateChanged.connect(self.stateChanged)
         self.player.volumeChanged.connect(controls.setVolume)
         self.player.mutedChanged.connect(controls.setMuted)
 
@@ -965,19 +1783,34 @@ class Player(QWidget):
         self.subInputBox.setWordWrapMode(QTextOption.WordWrap)
         self.subInputBox.setMaximumHeight(100)
 
-        self.subtitleDisplayTable = SubDataTableWidget(self)  # QTableWidget(1, 4)
+        self.subtitleDisplayTable = SubDataTableWidget(self)
         self.subtitleDisplayTable.setStyleSheet('background-color: #f8f8f8')
         self.subtitleDisplayTable.setMinimumWidth(320)
         self.subtitleDisplayTable.setMinimumHeight(180)
         self.subtitleDisplayTable.setEnabled(True)
 
         self.lastHighlightIndex = []
-        self.lastBackgroundColor = {}
+
+        # the subtitle highlight and overlay only change at cue boundaries
+        self.cueScheduler = CueScheduler(self.player, self.subtitleDisplayTable.subtitleData, self)
+        self.cueScheduler.boundary.connect(self.updateTablePos)
+        # while playing, the time display follows the screen refresh rate
+        screen = QApplication.primaryScreen()
+        refreshRate = screen.refreshRate() if screen is not None else 0
+        self.positionTimer = QTimer(self)
+        self.positionTimer.setInterval(round(1000 / (refreshRate if refreshRate > 0 else 60)))
+        self.positionTimer.timeout.connect(self.refreshPosition)
 
         self.subtitleDisplayTable.subtitleData.progress.connect(
             self.updateLoadSrtProgressBar)
         self.subtitleDisplayTable.subtitleData.complete.connect(
             self.closeProgressBar)
+        self.subtitleDisplayTable.subtitleData.saved.connect(self.srtSaved)
+        self.subtitleDisplayTable.subtitleData.positionRestored.connect(self.player.setPosition)
+        cacheLocation = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+        if len(cacheLocation) > 0:
+            self.subtitleDisplayTable.subtitleData.cacheDirectory = os.path.join(cacheLocation,
+                                                                                 self.CueCacheDirectory)
 
         self.srtFileName = ''
 
@@ -1062,6 +1895,14 @@ class Player(QWidget):
         addSubToArray = QPushButton('Add Subtitle', clicked=self.addCurrentSub)
         addSubToArray.setToolTip('Add subtitle text in the input box, with currently set timestamp, to the subtitle queue. (Num 2/O)')
         subInputLayout_LH.addWidget(addSubToArray)
+        undoSub = QPushButton('Undo', clicked=self.subtitleDisplayTable.subtitleData.undo)
+        undoSub.setShortcut(QKeySequence(QKeySequence.Undo))
+        undoSub.setToolTip('Undo the last change to the subtitle table (Ctrl+Z)')
+        subInputLayout_LH.addWidget(undoSub)
+        redoSub = QPushButton('Redo', clicked=self.subtitleDisplayTable.subtitleData.redo)
+        redoSub.setShortcut(QKeySequence(QKeySequence.Redo))
+        redoSub.setToolTip('Redo the last undone change to the subtitle table (Ctrl+Shift+Z)')
+        subInputLayout_LH.addWidget(redoSub)
         subInputLayout_L.addLayout(subInputLayout_LH)
 
         subInputLayout_LH = QHBoxLayout()
@@ -1070,6 +1911,23 @@ class Player(QWidget):
         loadSubToSys.setEnabled(True)
         subInputLayout_LH.addWidget(loadSubToSys)
         subInputLayout_LH.addStretch(1)
+        # shown while a file loads, the table stays usable meanwhile
+        self.loadSubProgressBar = QProgressBar()
+        self.loadSubProgressBar.setFixedHeight(20)
+        self.loadSubProgressBar.setTextVisible(True)
+        self.loadSubProgressBar.setAlignment(Qt.AlignCenter)
+        self.loadSubProgressBar.setFormat('Loading SRT (%v %)')
+        loadSubCancel = QPushButton('Cancel', clicked=self.cancelLoadSRT)
+        loadSubCancel.setToolTip('Stop loading, subtitles loaded so far are kept')
+        self.loadSubProgress = QWidget()
+        loadSubProgressLayout = QHBoxLayout()
+        loadSubProgressLayout.setContentsMargins(0, 0, 0, 0)
+        loadSubProgressLayout.addWidget(self.loadSubProgressBar, stretch=1)
+        loadSubProgressLayout.addWidget(loadSubCancel)
+        self.loadSubProgress.setLayout(loadSubProgressLayout)
+        self.loadSubProgress.hide()
+        subInputLayout_LH.addWidget(self.loadSubProgress, stretch=2)
+        subInputLayout_LH.addStretch(1)
         storeSubToSys = QPushButton('Save SRT', clicked=self.storeSRT)
         storeSubToSys.setToolTip('Save subtitle data in the system to SubRip (.srt) subtitle file')
         storeSubToSys.setEnabled(True)
@@ -1089,16 +1947,43 @@ class Player(QWidget):
         self.subOffsetInputBox.setStyleSheet('background-color: #ffffff')
         subOffsetInputLabel = QLabel('Subtitle Offset:')
         subOffsetApplyButton = QPushButton('Apply Offset', clicked = self.applySubOffset)
-        subOffsetApplyButton.setToolTip('Apply the currently set offset to all the subtitles in the table')
+        subOffsetApplyButton.setToolTip('Apply the currently set offset to the selected subtitles, '
+                                        'or to all the subtitles in the table if at most one is selected')
         subInputLayout_RH.addWidget(subOffsetInputLabel)
         subInputLayout_RH.addWidget(self.subOffsetInputBox)
         subInputLayout_RH.addStretch(1)
         subInputLayout_RH.addWidget(subOffsetApplyButton)
         subInputLayout_R.addLayout(subInputLayout_RH)
+
+        subInputLayout_RS = QHBoxLayout()
+        self.subScaleInputBox = QLineEdit('25/23.976')
+        self.subScaleInputBox.setFixedWidth(80)
+        self.subScaleInputBox.setStyleSheet('background-color: #ffffff')
+        self.subScaleInputBox.setToolTip('Time scale factor, or a ratio of frame rates: '
+                                         'subtitles timed at 25 fps play at 23.976 fps scaled by 25/23.976')
+        subScaleInputLabel = QLabel('Subtitle Scale:')
+        subScaleApplyButton = QPushButton('Apply Scale', clicked=self.applySubScale)
+        subScaleApplyButton.setToolTip('Scale the times of all the subtitles in the table, or of the selected '
+                                       'subtitles about the start of the first one')
+        self.subSyncButton = QPushButton('Sync Point', clicked=self.addSubSyncPoint)
+        self.subSyncButton.setToolTip('Mark the current position as where the selected subtitle should start. '
+                                      'Marking a second subtitle re-times the table through both points')
+        subInputLayout_RS.addWidget(subScaleInputLabel)
+        subInputLayout_RS.addWidget(self.subScaleInputBox)
+        subInputLayout_RS.addStretch(1)
+        subInputLayout_RS.addWidget(subScaleApplyButton)
+        subInputLayout_RS.addWidget(self.subSyncButton)
+        subAlignButton = QPushButton('Align to SRT', clicked=self.alignSRT)
+        subAlignButton.setToolTip('Re-time the subtitles to match the timing of a reference SubRip (.srt) file, '
+                                  'e.g. the same subtitles in another language')
+        subInputLayout_RS.addWidget(subAlignButton)
+        subInputLayout_R.addLayout(subInputLayout_RS)
+        self.subSyncPoints = []  # (cue start, position) marked with Sync Point
         subInputLayout_R.addWidget(subInputBoxLabel)
         subInputLayout_R.addWidget(self.subInputBox)
 
         numpadHelper.appendWidget(self.subOffsetInputBox)
+        numpadHelper.appendWidget(self.subScaleInputBox)
 
         subInputLayout.addLayout(subInputLayout_R, stretch=2)
 
@@ -1178,25 +2063,27 @@ class Player(QWidget):
             self, "Load SRT", filter='SubRip (*.srt)')
         fileInfo = QFileInfo(srtName)
         if fileInfo.exists():
-            ifile = open(fileInfo.absoluteFilePath(), 'r', encoding='utf-8')
-            self.subtitleDisplayTable.subtitleData.loadSRT(ifile)
             self.showProgressBar()
-            # time.sleep(1)
-            self.subtitleDisplayTable.subtitleData.start()
+            mapped = fileInfo.size() >= self.MappedLoadSize
+            self.subtitleDisplayTable.subtitleData.loadSRTFile(fileInfo.absoluteFilePath(),
+                                                               progressive=not mapped, mapped=mapped)
+
+    def cancelLoadSRT(self):
+        # not connected to cancelLoad directly, clicked would pass checked=False as notify
+        self.subtitleDisplayTable.subtitleData.cancelLoad()
 
     def storeSRT(self):
         srtName, _ = QFileDialog.getSaveFileName(
             self, "Save SRT", filter='SubRip (*.srt)')
-        fileInfo = QFileInfo(srtName)
-        try:
-            ofile = open(fileInfo.absoluteFilePath(), 'w', encoding='utf-8')
-        except Exception as e:
-            self.showErrorMessage('storeSRT(): %s' % (str(e)))
+        if len(srtName) == 0:
             return
-        self.subtitleDisplayTable.subtitleData.storeSRT(ofile)
-        ofile.close()
+        fileInfo = QFileInfo(srtName)
+        self.subtitleDisplayTable.subtitleData.storeSRTFile(fileInfo.absoluteFilePath())
         return
 
+    def srtSaved(self, fileName: str):
+        print('Saved %s' % (fileName))
+
     def markSubStart(self):
         state = self.player.state()
         self.player.pause()
@@ -1265,6 +2152,7 @@ class Player(QWidget):
             self.player.setMedia(QMediaContent(url))
             self.setWindowTitle('Subtitle Creator: %s' % (
                 fileInfo.absoluteFilePath().split('/')[-1].rsplit('.', maxsplit=1)[0]))
+            self.startAutosave(fileInfo.absoluteFilePath() + self.AutosaveSuffix)
 
         else:
             url = QUrl(name)
@@ -1272,6 +2160,22 @@ class Player(QWidget):
                 self.player.setMedia(QMediaContent(url))
                 self.setWindowTitle('Subtitle Creator: %s' % (name))
 
+    def startAutosave(self, autosaveName: str):
+        """
+        Journal the subtitle edits next to the media file, offering to
+        recover the subtitles of an earlier session that did not end with
+        them saved.
+        """
+        subtitleData = self.subtitleDisplayTable.subtitleData
+        if QFileInfo(autosaveName).exists():
+            answer = QMessageBox.question(
+                self, 'Recover Subtitles',
+                'Subtitles from an earlier session with this file were not saved. Recover them?',
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if answer == QMessageBox.Yes:
+                subtitleData.recoverAutosave(autosaveName)
+        subtitleData.startAutosave(autosaveName)
+
     def durationChanged(self, duration):
         duration /= 1000
         self.duration = duration
@@ -1285,58 +2189,32 @@ class Player(QWidget):
 
         self.updateDurationInfo(progress)
 
+    def refreshPosition(self):
+        self.positionChanged(self.player.position())
+
+    def stateChanged(self, state):
+        if state == QMediaPlayer.PlayingState:
+            self.positionTimer.start()
+        else:
+            self.positionTimer.stop()
+            self.refreshPosition()
+
     def updateTablePos(self, progress):
         if progress is None:
             return
-        if self.subtitleDisplayTable.subtitleData.tstampdata is None:
-            return
-        idx = (np.where((self.subtitleDisplayTable.subtitleData.tstampdata[0] < progress) & (
-            self.subtitleDisplayTable.subtitleData.tstampdata[1] > progress))[0]).tolist()
-        if len(self.lastHighlightIndex) != 0:  # something was being displayed
-            for old_idx in self.lastHighlightIndex:
-                if old_idx in idx:
-                    pass
-                else:  # disable this one
-                    try:
-                        old_color = self.lastBackgroundColor[old_idx]
-                        if (old_color.name() == '#000000'):
-                            old_color = QColor('white')
-                        self.subtitleDisplayTable.item(
-                            old_idx, 0).setBackground(old_color)
-                        self.subtitleDisplayTable.item(
-                            old_idx, 1).setBackground(old_color)
-                        self.subtitleDisplayTable.item(
-                            old_idx, 2).setBackground(old_color)
-                        del self.lastBackgroundColor[old_idx]
-                    except Exception:
-                        pass  # todo: disable highlight
-
-        for id in idx:
-            if id in self.lastHighlightIndex:  # already highlighted
-                pass
-            else:
-                try:
-                    self.lastBackgroundColor[id] = self.subtitleDisplayTable.item(
-                        id, 0).background().color()
-                    self.subtitleDisplayTable.item(
-                        id, 0).setBackground(QColor(0xfc9803))
-                    self.subtitleDisplayTable.item(
-                        id, 1).setBackground(QColor(0xfc9803))
-                    self.subtitleDisplayTable.item(
-                        id, 2).setBackground(QColor(0xfc9803))
-                    self.subtitleDisplayTable.scrollToItem(
-                        self.subtitleDisplayTable.item(id, 0))
-                except Exception:
-                    pass  # todo: enable highlight
+        idx = self.subtitleDisplayTable.subtitleData.cues.activeRows(progress)
+        table = self.subtitleDisplayTable
+        newRows = table.subtitleData.model.setActiveRows(idx)
+        if len(newRows) > 0:
+            table.scrollTo(table.subtitleData.model.index(min(newRows), 0))
+        cues = self.subtitleDisplayTable.subtitleData.cues
         total_text = ''
         for id in idx:
-            try:
-                total_text += self.subtitleDisplayTable.item(id, 2).text() + '\n'
-            except Exception:
-                pass
+            total_text += cues.text(id) + '\n'
         if len(total_text) == 0:
             total_text = '\n\n'
-        self.embedSub.setText(total_text)
+        if total_text != self.embedSub.text():
+            self.embedSub.setText(total_text)
         self.lastHighlightIndex = idx
 
     def metaDataChanged(self):
@@ -1362,15 +2240,36 @@ class Player(QWidget):
         progress = self.player.position()
         if progress is None:
             return
-        if self.subtitleDisplayTable.subtitleData.tstampdata is None:
+        cues = self.subtitleDisplayTable.subtitleData.cues
+        row = cues.previousStart(progress)
+        if row >= 0 and progress - cues.starts[row] < 10000: # 10 seconds
+            self.player.setPosition(int(cues.starts[row]))
+            self.player.play()
+
+    def cueNavigationPosition(self):
+        """
+        Position to step to the previous or next cue from. Seeks complete
+        asynchronously, so while the player is still near the start of the
+        last cue stepped to, step from that start instead.
+        """
+        progress = self.player.position()
+        if self.cueNavTarget is not None and abs(progress - self.cueNavTarget) < self.CueNavSlack:
+            return self.cueNavTarget
+        return progress
+
+    def gotoCueStart(self, row):
+        if row < 0:
             return
-        delta = (progress - self.subtitleDisplayTable.subtitleData.tstampdata[0])
-        delta = delta[np.where(delta > 0)]
-        if len(delta) > 0:
-            val = delta.min()
-            if val < 10000: # 10 seconds
-                self.player.setPosition(progress - val)
-                self.player.play()
+        self.cueNavTarget = int(self.subtitleDisplayTable.subtitleData.cues.starts[row])
+        self.player.setPosition(self.cueNavTarget)
+
+    def gotoPreviousSub(self):
+        cues = self.subtitleDisplayTable.subtitleData.cues
+        self.gotoCueStart(cues.previousStart(self.cueNavigationPosition()))
+
+    def gotoNextSub(self):
+        cues = self.subtitleDisplayTable.subtitleData.cues
+        self.gotoCueStart(cues.nextStart(self.cueNavigationPosition()))
 
     def getSubOffsetS(self):
         val = self.subOffsetS
@@ -1392,7 +2291,84 @@ class Player(QWidget):
         except Exception:
             return
         self.subOffsetInputBox.setText('%s%.3f'%('+' if val > 0 else '', val))
-        self.subtitleDisplayTable.subtitleData.addOffset(round(val * 1000))
+        begin, end = self.selectedTimeRange()
+        try:
+            if begin is None:
+                self.subtitleDisplayTable.subtitleData.addOffset(round(val * 1000))
+            else:
+                self.subtitleDisplayTable.subtitleData.retime(1, round(val * 1000), begin, end)
+        except ValueError as e:
+            self.showErrorMessage(str(e))
+
+    def applySubScale(self):
+        try:
+            scale = parseScale(self.subScaleInputBox.text())
+        except ValueError as e:
+            self.showErrorMessage(str(e))
+            return
+        begin, end = self.selectedTimeRange()
+        # a selection is scaled about its first start, so that it stays in place
+        try:
+            self.subtitleDisplayTable.subtitleData.retime(scale, 0 if begin is None else begin * (1 - scale),
+                                                          begin, end)
+        except ValueError as e:
+            self.showErrorMessage(str(e))
+
+    def alignSRT(self):
+        srtName, _ = QFileDialog.getOpenFileName(
+            self, "Align to SRT", filter='SubRip (*.srt)')
+        if len(srtName) == 0:
+            return
+        subtitleData = self.subtitleDisplayTable.subtitleData
+        try:
+            reference, _ = readMappedCueStore(srtName)
+            anchors, targets = subtitleData.alignTo(reference)
+        except Exception as e:
+            msg = 'alignSRT(): %s' % (str(e))
+            print(msg)
+            self.showErrorMessage(msg)
+            return
+        print('Aligned to %s: %d points, %.3f s to %.3f s offset' % (
+            srtName, len(anchors), np.min(targets - anchors) / 1000, np.max(targets - anchors) / 1000))
+
+    def selectedTimeRange(self) -> tuple:
+        """
+        Get the range of start times (begin, end) of the selected subtitles if
+        more than one is selected, else (None, None) for all of them.
+        """
+        rows = [index.row() for index in self.subtitleDisplayTable.selectionModel().selectedRows()]
+        if len(rows) < 2:
+            return None, None
+        starts = self.subtitleDisplayTable.subtitleData.cues.starts
+        return int(starts[min(rows)]), int(starts[max(rows)]) + 1
+
+    def addSubSyncPoint(self):
+        """
+        Mark the current position as the start of the selected subtitle. The
+        second mark re-times every subtitle linearly through both.
+        """
+        row = self.subtitleDisplayTable.currentIndex().row()
+        subtitleData = self.subtitleDisplayTable.subtitleData
+        if row < 0 or row >= subtitleData.getNumItems():
+            self.showErrorMessage('Select the subtitle to sync first')
+            return
+        self.subSyncPoints.append((int(subtitleData.cues.starts[row]), self.player.position()))
+        if len(self.subSyncPoints) < 2:
+            self.subSyncButton.setText('Sync Point 2')
+            return
+        (source1, target1), (source2, target2) = self.subSyncPoints
+        self.subSyncPoints = []
+        self.subSyncButton.setText('Sync Point')
+        try:
+            scale, offset = linearSync(source1, target1, source2, target2)
+        except ValueError as e:
+            self.showErrorMessage(str(e))
+            return
+        print('Sync: scale %.6f, offset %.3f s' % (scale, offset / 1000))
+        try:
+            subtitleData.retime(scale, offset)
+        except ValueError as e:
+            self.showErrorMessage(str(e))
 
     def getCompensationTimeMs(self):
         try:
@@ -1485,21 +2461,27 @@ class Player(QWidget):
     def updateDurationInfo(self, currentInfo):
         duration = self.duration
         if currentInfo or duration:
-            currentTime = QTime((int(currentInfo)//3600) % 60, (int(currentInfo)//60) % 60,
-                                int(currentInfo) % 60, int(currentInfo*1000) % 1000)
-            totalTime = QTime((int(duration)//3600) % 60, (int(duration)//60) % 60,
-                              int(duration) % 60, int(duration*1000) % 1000)
-
-            format = 'hh:mm:ss' if duration > 3600 else 'mm:ss'
-            tStr = currentTime.toString(
-                format) + " / " + totalTime.toString(format)
-            ttStr = currentTime.toString(format + '.zzz')
+            withHours = duration > 3600
+            currentStr = self.clockToStr(currentInfo, withHours)
+            tStr = currentStr + " / " + self.clockToStr(duration, withHours)
+            ttStr = currentStr + '.%03d' % (int(currentInfo*1000) % 1000)
         else:
             tStr = ""
             ttStr = "00:00.000"
 
-        self.labelDuration.setText(tStr)
-        self.currentPositionText.setText('Current: ' + ttStr)
+        # called for every displayed frame, only touch the labels on changes
+        if tStr != self.labelDuration.text():
+            self.labelDuration.setText(tStr)
+        ttStr = 'Current: ' + ttStr
+        if ttStr != self.currentPositionText.text():
+            self.currentPositionText.setText(ttStr)
+
+    @staticmethod
+    def clockToStr(seconds: float, withHours: bool) -> str:
+        seconds = int(seconds)
+        if withHours:
+            return '%02d:%02d:%02d' % (seconds//3600, (seconds//60) % 60, seconds % 60)
+        return '%02d:%02d' % ((seconds//60) % 60, seconds % 60)
 
     def showErrorMessage(self, errorMessageText: str):
         if self.errorMessageDialog is None:
@@ -1522,33 +2504,14 @@ class Player(QWidget):
         self.errorMessageDialog.show()
 
     def showProgressBar(self):
-        if self.loadSubProgress is None:
-            self.loadSubProgress = QDialog(self)
-            self.loadSubProgress.setModal(True)
-            self.loadSubProgress.setWindowFlags(
-                Qt.Dialog | Qt.FramelessWindowHint | Qt.WindowTitleHint)
-            self.loadSubProgressBar = QProgressBar()
-            self.loadSubProgressBar.setFixedWidth(250)
-            self.loadSubProgressBar.setFixedHeight(20)
-            self.loadSubProgressBar.setTextVisible(True)
-            self.loadSubProgressBar.setAlignment(Qt.AlignCenter)
-            self.loadSubProgressBar.setFormat('Loading SRT (%v %)')
-            layout = QVBoxLayout()
-            layout.addWidget(self.loadSubProgressBar, alignment=Qt.AlignCenter)
-            self.loadSubProgress.setLayout(layout)
-            self.loadSubProgress.setWindowTitle('Loading SRT...')
-            self.loadSubProgress.setMinimumWidth(300)
-            self.loadSubProgress.setMinimumHeight(100)
-
+        self.loadSubProgressBar.setValue(0)
         self.loadSubProgress.show()
 
     def closeProgressBar(self):
-        if self.loadSubProgress is not None:
-            self.loadSubProgress.hide()
+        self.loadSubProgress.hide()
 
     def updateLoadSrtProgressBar(self, progress: int):
-        if self.loadSubProgressBar is not None:
-            self.loadSubProgressBar.setValue(progress)
+        self.loadSubProgressBar.setValue(progress)
 
     def showColorDialog(self):
         if self.colorDialog is None:
@@ -1600,8 +2563,12 @@ class Player(QWidget):
 
 if __name__ == '__main__':
 
+    import multiprocessing
     import sys
 
+    # the spawned workers of readParallelCueStore re-run the frozen executable
+    multiprocessing.freeze_support()
+
     app = QApplication(sys.argv)
     appIcon = QIcon('mplayer.ico')
     app.setWindowIcon(appIcon)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+Batch processing of SubRip files from the command line.
+
+Uses the same parsing, offset, validation and saving code as the editor,
+but no Qt at all, so it runs without a display server:
+
+    python SRTBatch.py --validate 'deliveries/**/*.srt'
+    python SRTBatch.py --offset -1.5 --output-dir shifted episode_*.srt
+    python SRTBatch.py --offset +2 --in-place movie.srt
+    python SRTBatch.py --scale 25/23.976 --output-dir 23.976fps episode_*.srt
+
+Directories are searched for .srt files. With --jobs the files are spread
+over a pool of worker processes, and results are printed as they finish:
+
+    python SRTBatch.py --jobs 0 --validate --report report.json deliveries/
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from SRTCore import CueStore, parseScale, readMappedCueStore, tstampToStr, writeSRTFile
+
+
+def expandPaths(patterns: list) -> list:
+    """
+    Expand files, directories (all .srt files below them) and glob patterns
+    (** included) to a list of unique files, in the order given.
+    """
+    fileNames = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(glob.escape(pattern), '**', '*.srt'), recursive=True))
+        elif any(c in pattern for c in '*?['):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for fileName in matches:
+            key = os.path.abspath(fileName)
+            if key not in seen and not os.path.isdir(fileName):
+                seen.add(key)
+                fileNames.append(fileName)
+    return fileNames
+
+
+def loadSRTFile(fileName: str) -> CueStore:
+    # texts are only decoded if the file is saved
+    cues, _ = readMappedCueStore(fileName)
+    return cues
+
+
+def processFile(fileName: str, offset: int = 0, outputName: str = None, strict: bool = False,
+                scale: float = 1.0) -> dict:
+    """
+    Load a SubRip file, re-time it, validate and optionally save it.
+
+    Parameters:
+        fileName (str): SubRip file to process
+        offset (int): Milliseconds to move every cue by, after scaling
+        outputName (str): Where to save the result, nothing is saved if None
+        strict (bool): Do not save files with overlapping cues
+        scale (float): Factor to scale every cue time by
+
+    Returns:
+        dict: file, cues, overlaps (1-based cue numbers), output, error and seconds
+    """
+    result = {'file': fileName, 'cues': 0, 'overlaps': [], 'output': None, 'error': None, 'seconds': 0.0}
+    begin = time.perf_counter()
+    try:
+        cues = loadSRTFile(fileName)
+        result['cues'] = len(cues)
+        if len(cues) == 0:
+            with open(fileName, 'rb') as srtFile:
+                if len(srtFile.read().lstrip(b'\xef\xbb\xbf').strip()) > 0:
+                    raise ValueError('no subtitles found')
+        if scale != 1 and len(cues) > 0:
+            starts, stops = cues.retimed(scale, offset)
+            cues.setTimes(0, starts, stops)
+        elif offset != 0 and len(cues) > 0:
+            cues.shift(offset)
+        if len(cues) > 0 and cues.starts[0] < 0:
+            raise ValueError('%s moves cue 1 to %s, before the start' % (
+                'offset' if scale == 1 else 'scale and offset', '-' + tstampToStr(-int(cues.starts[0]))))
+        result['overlaps'] = [row + 1 for row in cues.badRows()]
+        if outputName is not None:
+            if strict and len(result['overlaps']) > 0:
+                raise ValueError('not saved, subtitle data invalid')
+            writeSRTFile(outputName, cues.starts, cues.stops, cues.texts)
+            result['output'] = outputName
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    result['seconds'] = time.perf_counter() - begin
+    return result
+
+
+def processTask(task: tuple) -> tuple:
+    """
+    Pool entry point: (index, processFile arguments) -> (index, result).
+    """
+    index, args = task
+    return index, processFile(*args)
+
+
+def limitMemory(megabytes: int) -> None:
+    """
+    Pool initializer capping the address space of a worker process.
+    """
+    if megabytes is None:
+        return
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    limit = megabytes * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def runBatch(tasks: list, jobs: int = 1, filesPerWorker: int = None, memoryLimit: int = None):
+    """
+    Process files, yielding (index, result) in the order they finish.
+
+    Parameters:
+        tasks (list): processFile argument tuples
+        jobs (int): Number of worker processes, 1 processes in this process
+        filesPerWorker (int): Replace each worker after this many files
+        memoryLimit (int): Address space limit per worker in MiB (POSIX only)
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        for index, args in enumerate(tasks):
+            yield processTask((index, args))
+        return
+    jobs = min(jobs, len(tasks))
+    chunksize = max(1, min(16, len(tasks) // (jobs * 8)))
+    with multiprocessing.Pool(jobs, initializer=limitMemory, initargs=(memoryLimit,),
+                              maxtasksperchild=filesPerWorker) as pool:
+        for item in pool.imap_unordered(processTask, enumerate(tasks), chunksize):
+            yield item
+
+
+def summarize(results: list, wallSeconds: float) -> dict:
+    """
+    Totals over all results, which are expected in input order.
+    """
+    return {
+        'files': len(results),
+        'cues': sum([result['cues'] for result in results]),
+        'filesWithOverlaps': sum([len(result['overlaps']) > 0 for result in results]),
+        'overlappingCues': sum([len(result['overlaps']) for result in results]),
+        'errors': sum([result['error'] is not None for result in results]),
+        'cpuSeconds': sum([result['seconds'] for result in results]),
+        'wallSeconds': wallSeconds,
+    }
+
+
+def outputFileName(fileName: str, outputDir: str, inPlace: bool):
+    if inPlace:
+        return fileName
+    if outputDir is not None:
+        return os.path.join(outputDir, os.path.basename(fileName))
+    return None
+
+
+def formatResult(result: dict) -> str:
+    if result['error'] is not None and result['cues'] == 0:
+        return '%s: error: %s' % (result['file'], result['error'])
+    line = '%s: %d cues' % (result['file'], result['cues'])
+    if len(result['overlaps']) > 0:
+        line += ', overlapping: %s' % (','.join([str(idx) for idx in result['overlaps']]))
+    if result['output'] is not None:
+        line += ', saved to %s' % (result['output'])
+    if result['error'] is not None:
+        line += ', error: %s' % (result['error'])
+    return line
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Offset, validate and re-save SubRip (.srt) files.')
+    parser.add_argument('files', nargs='+', help='SubRip files or glob patterns (quote them to use **)')
+    parser.add_argument('--offset', type=float, default=0.0, help='Seconds to move every subtitle by, e.g. -1.5')
+    parser.add_argument('--scale', type=parseScale, default=1.0,
+                        help='Factor to scale every subtitle time by before the offset, e.g. 25/23.976 for '
+                        'subtitles timed at 25 fps to 23.976 fps')
+    parser.add_argument('--validate', action='store_true',
+                        help='Exit with status 1 if any file has overlapping subtitles')
+    parser.add_argument('--strict', action='store_true', help='Do not save files with overlapping subtitles')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--output-dir', default=None, help='Save the processed files to this directory')
+    output.add_argument('--in-place', action='store_true', help='Overwrite the input files')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes, 0 for one per CPU core')
+    parser.add_argument('--files-per-worker', type=int, default=100,
+                        help='Replace a worker process after this many files, 0 to keep them')
+    parser.add_argument('--memory-limit', type=int, default=None,
+                        help='Address space limit per worker process in MiB (POSIX only)')
+    parser.add_argument('--report', default=None, help='Write per file results and totals as JSON, in input order')
+    args = parser.parse_args(argv)
+
+    offset = round(args.offset * 1000)
+    fileNames = expandPaths(args.files)
+    if len(fileNames) == 0:
+        print('No files matched', file=sys.stderr)
+        return 2
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    tasks = [(fileName, offset, outputFileName(fileName, args.output_dir, args.in_place), args.strict, args.scale)
+             for fileName in fileNames]
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    results = [None] * len(tasks)
+    begin = time.perf_counter()
+    for index, result in runBatch(tasks, jobs, args.files_per_worker or None, args.memory_limit):
+        results[index] = result
+        print(formatResult(result), flush=True)
+    summary = summarize(results, time.perf_counter() - begin)
+
+    print('%d files, %d cues, %d with overlaps, %d errors, %.3f s' % (
+        summary['files'], summary['cues'], summary['filesWithOverlaps'], summary['errors'],
+        summary['wallSeconds']), file=sys.stderr)
+    if args.report is not None:
+        with open(args.report, 'w', encoding='utf-8') as ofile:
+            json.dump({'files': results, 'summary': summary}, ofile, indent=2)
+            ofile.write('\n')
+    if summary['errors'] > 0:
+        return 2
+    if args.validate and summary['filesWithOverlaps'] > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
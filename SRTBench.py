@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the SRTData hot paths on synthetic subtitle files.
+
+Runs headless on the Qt offscreen platform and prints the results as JSON,
+so that runs from different revisions can be compared:
+
+    python SRTBench.py --sizes 1000 10000 --output before.json
+    python SRTBench.py --sizes 1000 10000 --compare before.json
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5.QtCore import QT_VERSION_STR
+from PyQt5.QtWidgets import QApplication, QTableView
+
+from SRTCore import (alignCueStarts, cueCacheName, readCueCache, readCueStore, readMappedCueStore,
+                     readParallelCueStore, writeCueCache, writeSRTFile)
+from QtSubtitleEditor import SRTData
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+SAMPLE_TEXTS = ['♪', '- Hello there.\n- Hi.', '[MUSIC]', 'Where are you going?',
+                'I can\'t tell you that.\nNot yet.', '(SIGHS)', 'Come on!']
+
+
+def makeCues(count: int, seed: int = 0, overlapFraction: float = 0.0):
+    """
+    Generate count sorted cues with realistic gaps, durations and a few overlaps.
+    """
+    rng = np.random.default_rng(seed)
+    gaps = rng.integers(100, 2000, count)
+    durations = rng.integers(500, 4000, count)
+    starts = np.cumsum(gaps + np.concatenate(([0], durations[:-1]))).astype(np.int64)
+    stops = starts + durations
+    overlap = rng.random(count) < overlapFraction
+    overlap[0] = False
+    starts[overlap] -= np.minimum(gaps[overlap] + 200, durations[np.nonzero(overlap)[0] - 1])
+    order = np.argsort(starts, kind='stable')
+    texts = [SAMPLE_TEXTS[i] for i in rng.integers(0, len(SAMPLE_TEXTS), count).tolist()]
+    return starts[order], stops[order], [texts[i] for i in order.tolist()]
+
+
+def makeSRTFile(directory: str, count: int, overlapFraction: float) -> str:
+    fileName = os.path.join(directory, 'bench_%d_%g.srt' % (count, overlapFraction))
+    if not os.path.exists(fileName):
+        writeSRTFile(fileName, *makeCues(count, overlapFraction=overlapFraction))
+    return fileName
+
+
+def timeit(func, repeat: int, ops: int = 1) -> dict:
+    """
+    Run func repeat times, each run doing ops operations.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times),
+            'repeat': repeat, 'ops': ops, 'perOp': min(times) / ops}
+
+
+def loadData(fileName: str) -> SRTData:
+    data = SRTData(QTableView())
+    with open(fileName, 'r', encoding='utf-8') as ifile:
+        data.readSRT(ifile)
+    return data
+
+
+def retainedBytes(func) -> dict:
+    """
+    Memory allocated by func and still held by its result, and the peak
+    while it ran, as traced by tracemalloc (mapped file pages not included).
+    """
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    result = func()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {'retained': current - base, 'peak': peak - base}
+
+
+def measureMemory(fileName: str, count: int) -> dict:
+    def textLoad():
+        with open(fileName, 'r', encoding='utf-8') as ifile:
+            return readCueStore(ifile)
+    results = {'readCueStore': retainedBytes(textLoad),
+               'readMappedCueStore': retainedBytes(lambda: readMappedCueStore(fileName))}
+    for name, result in results.items():
+        print('%8d %-20s %.1f MB retained, %.1f MB peak' % (count, name, result['retained'] / 1e6,
+                                                             result['peak'] / 1e6), file=sys.stderr)
+    return results
+
+
+def benchSize(fileName: str, count: int, repeat: int, edits: int, skip: set) -> dict:
+    results = {}
+    rng = np.random.default_rng(count)
+
+    def bench(name, func, ops=1):
+        if name in skip:
+            return
+        results[name] = timeit(func, repeat, ops)
+        print('%8d %-20s %.6f s' % (count, name, results[name]['min']), file=sys.stderr)
+
+    bench('load', lambda: loadData(fileName))
+    bench('readMappedCueStore', lambda: readMappedCueStore(fileName))
+    bench('readParallelCueStore', lambda: readParallelCueStore(fileName))
+    data = loadData(fileName)
+    with tempfile.TemporaryDirectory() as cacheDirectory:
+        cacheName = cueCacheName(cacheDirectory, fileName)
+        bench('writeCueCache', lambda: writeCueCache(cacheName, data.cues.starts, data.cues.stops, data.cues.texts))
+        if os.path.exists(cacheName):
+            bench('readCueCache', lambda: readCueCache(cacheName))
+    duration = int(data.cues.stops.max())
+
+    bench('storeSRT', lambda: data.storeSRT(io.StringIO()))
+    bench('storeDataToStream', lambda: data.storeDataToStream(io.StringIO()))
+
+    def addItems():
+        for start in rng.integers(0, duration, edits).tolist():
+            data.addItem(start, start + 1500, 'benchmark cue')
+    bench('addItem', addItems, edits)
+
+    def deleteItems():
+        for _ in range(edits):
+            data.deleteItem(int(rng.integers(0, data.getNumItems())))
+    bench('deleteItem', deleteItems, edits)
+
+    def addOffsets():
+        data.addOffset(1000)
+        data.addOffset(-1000)
+    bench('addOffset', addOffsets, 2)
+
+    bench('validateData', data.validateData)
+    bench('updateDisplayTable', data.updateDisplayTable)
+
+    def playback():
+        # 100 s of playback at the 10 ms notify interval
+        first = int(rng.integers(0, max(duration - 100000, 1)))
+        for position in range(first, first + 100000, 10):
+            data.cues.activeRows(position)
+    bench('activeRows.playback', playback, 10000)
+
+    def seeks():
+        for position in rng.integers(0, duration, 1000).tolist():
+            data.cues.activeRows(position)
+    bench('activeRows.seek', seeks, 1000)
+
+    def navigate():
+        cues = data.cues
+        for position in rng.integers(0, duration, 1000).tolist():
+            cues.nextStart(position)
+            cues.previousStart(position)
+            cues.nearestRow(position)
+    bench('navigate', navigate, 1000)
+
+    # the same cues timed for another frame rate, later and with a cut
+    starts = data.cues.starts
+    drifted = (np.where(starts > starts[len(starts) // 2], starts + 3000, starts) + 2000) * 25 / 23.976
+    bench('alignCueStarts', lambda: alignCueStarts(drifted, starts))
+    return results
+
+
+def gitRevision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ''
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """
+    Print the ratio of each timing to the same timing in baseline.
+    """
+    print('%8s %-20s %12s %12s %8s' % ('cues', 'operation', 'baseline', 'current', 'ratio'), file=sys.stderr)
+    for size, results in report['results'].items():
+        for name, result in results.items():
+            old = baseline.get('results', {}).get(size, {}).get(name)
+            if old is None:
+                continue
+            print('%8s %-20s %12.6f %12.6f %7.2fx' % (size, name, old['perOp'], result['perOp'],
+                                                      result['perOp'] / max(old['perOp'], 1e-12)), file=sys.stderr)
+    for size, results in report.get('memory', {}).items():
+        for name, result in results.items():
+            old = baseline.get('memory', {}).get(size, {}).get(name)
+            if old is None:
+                continue
+            print('%8s %-20s %9.1f MB %9.1f MB %7.2fx' % (size, name, old['retained'] / 1e6,
+                                                          result['retained'] / 1e6,
+                                                          result['retained'] / max(old['retained'], 1)),
+                  file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark SRTData on synthetic SubRip files.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Cue counts to benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions per measurement, the minimum is reported')
+    parser.add_argument('--edits', type=int, default=100, help='Cues added and deleted per measurement')
+    parser.add_argument('--overlaps', type=float, default=0.0,
+                        help='Fraction of overlapping cues in the synthetic files (storeDataToStream '
+                        'refuses to write overlapping data)')
+    parser.add_argument('--skip', nargs='*', default=[], help='Operations to leave out (memory for the memory use)')
+    parser.add_argument('--workdir', default=None, help='Directory for the synthetic files (default: temporary)')
+    parser.add_argument('--output', default=None, help='Write the JSON report here instead of stdout')
+    parser.add_argument('--compare', default=None, help='JSON report of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    report = {
+        'revision': gitRevision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'qt': QT_VERSION_STR,
+        'repeat': args.repeat,
+        'edits': args.edits,
+        'overlaps': args.overlaps,
+        'results': {},
+        'memory': {},
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = args.workdir or tmpdir
+        for count in args.sizes:
+            fileName = makeSRTFile(workdir, count, args.overlaps)
+            report['results'][str(count)] = benchSize(fileName, count, args.repeat, args.edits, set(args.skip))
+            if 'memory' not in args.skip:
+                report['memory'][str(count)] = measureMemory(fileName, count)
+
+    output = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as ofile:
+            ofile.write(output + '\n')
+    else:
+        print(output)
+    if args.compare is not None:
+        with open(args.compare, 'r', encoding='utf-8') as ifile:
+            compare(report, json.load(ifile))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2041 @@
+#!/usr/bin/env python
+"""
+SubRip (.srt) helpers shared by the subtitle editor.
+
+Nothing in this module touches Qt, so everything here can be used from
+worker threads, worker processes or without a display.
+"""
+
+import array
+import collections
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+
+# precompiled patterns, matched once per line while parsing
+SRT_TSTAMP_LINE = re.compile(
+    r'[0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9] --> [0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9]')
+SRT_INDEX_LINE = re.compile(r'[0-9]*$')  # cue number, or an empty line
+SRT_TSTAMP = re.compile(r'([0-9]+):([0-9][0-9]):([0-9][0-9]),([0-9][0-9][0-9])$')
+# a whole cue in undecoded UTF-8: number (or empty) line, timing line, then
+# the text lines up to and including the empty line ending the cue
+SRT_CUE_BYTES = re.compile(
+    rb'^[0-9]*\r?\n'
+    rb'([0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9] --> [0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9])'
+    rb'[^\n]*\n?((?:[ \t\r\f\v]*[^\s][^\n]*(?:\n|\Z))*)(?:[ \t\r\f\v]*(?:\n|\Z))?', re.M)
+# where undecoded SubRip data can be split: an empty line, then a cue number
+# and a timing line. Parsing resumes there the same no matter what came before.
+SRT_CUE_BOUNDARY = re.compile(
+    rb'\n[ \t\r\f\v]*\n(?=[0-9]+\r?\n[0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9] --> )')
+
+INVALID_TSTAMP = '--:--:--,---'
+# character layout of hh:mm:ss,mmm
+_TSTAMP_TEMPLATE = np.frombuffer(b'00:00:00,000', dtype=np.uint8)
+_TSTAMP_INVALID = np.frombuffer(INVALID_TSTAMP.encode('ascii'), dtype=np.uint8)
+_TSTAMP_DIGITS = np.array([0, 1, 3, 4, 6, 7, 9, 10, 11])
+_TSTAMP_WEIGHTS = np.array([36000000, 3600000, 600000, 60000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+
+
+def tstampToStr(tstamp: int) -> str:
+    """
+    Convert a time in milliseconds to a hh:mm:ss,mmm string.
+    """
+    if tstamp < 0:
+        return INVALID_TSTAMP
+    tstamp = int(tstamp)
+    return '%02d:%02d:%02d,%03d' % (tstamp // 3600000, (tstamp // 60000) % 60,
+                                    (tstamp // 1000) % 60, tstamp % 1000)
+
+
+def tstampsToStr(tstamps) -> list:
+    """
+    Convert an array of times in milliseconds to hh:mm:ss,mmm strings in one pass.
+
+    Negative times become --:--:--,---, hours past 99 get as many digits as
+    they need.
+    """
+    tstamps = np.asarray(tstamps, dtype=np.int64).ravel()
+    if len(tstamps) == 0:
+        return []
+    valid = tstamps >= 0
+    values = np.where(valid, tstamps, 0)
+    fields = (values // 3600000, (values // 60000) % 60, (values // 1000) % 60, values % 1000)
+    chars = np.empty((len(values), 12), dtype=np.uint8)
+    chars[:] = _TSTAMP_TEMPLATE
+    for col, (field, width) in zip((0, 3, 6, 9), zip(fields, (2, 2, 2, 3))):
+        for digit in range(width):
+            chars[:, col + width - 1 - digit] += ((field // 10 ** digit) % 10).astype(np.uint8)
+    chars[~valid] = _TSTAMP_INVALID
+    out = chars.view('S12').ravel().astype('U12').tolist()
+    for i in np.nonzero(fields[0] > 99)[0].tolist():
+        out[i] = tstampToStr(int(tstamps[i]))
+    return out
+
+
+def _charsToTstamps(chars: np.ndarray) -> np.ndarray:
+    """
+    Convert an (n, 12) array of hh:mm:ss,mmm ASCII codes to milliseconds,
+    -1 where a row is not a valid timestamp.
+    """
+    digits = chars[:, _TSTAMP_DIGITS].astype(np.int64) - 48
+    valid = np.all((digits >= 0) & (digits <= 9), axis=1)
+    valid &= (chars[:, 2] == 58) & (chars[:, 5] == 58) & (chars[:, 8] == 44)  # ':', ':', ','
+    return np.where(valid, digits @ _TSTAMP_WEIGHTS, -1)
+
+
+def strToTstamp(tstampStr: str) -> int:
+    """
+    Convert a hh:mm:ss,mmm string to milliseconds, -1 if it is not valid.
+    """
+    m = SRT_TSTAMP.match(tstampStr.strip())
+    if m is None:
+        return -1
+    h, mi, s, ms = m.groups()
+    return ((int(h) * 60 + int(mi)) * 60 + int(s)) * 1000 + int(ms)
+
+
+def parseScale(scaleStr: str) -> float:
+    """
+    Convert a positive time scale factor, such as 1.04271 or a frame rate
+    ratio such as 25/23.976, to a float. Raises ValueError if it is not valid.
+    """
+    numerator, _, denominator = scaleStr.strip().partition('/')
+    try:
+        scale = float(numerator) / float(denominator) if len(denominator) > 0 else float(numerator)
+    except (ValueError, ZeroDivisionError):
+        scale = 0
+    if not np.isfinite(scale) or scale <= 0:
+        raise ValueError('Invalid time scale %r' % (scaleStr))
+    return scale
+
+
+def linearSync(source1: int, target1: int, source2: int, target2: int) -> tuple:
+    """
+    Solve the linear re-timing t' = scale * t + offset taking two source
+    times to two target times (all milliseconds), e.g. the starts of an
+    early and a late cue to where they should be.
+
+    Returns:
+        (scale, offset): Raises ValueError if the sources are the same or the
+        targets are not in the same order
+    """
+    if source1 == source2:
+        raise ValueError('Sync points need two different source times')
+    scale = (target2 - target1) / (source2 - source1)
+    if scale <= 0:
+        raise ValueError('Sync points must keep their order')
+    return scale, target1 - scale * source1
+
+
+def warpTimes(times, anchors, targets) -> np.ndarray:
+    """
+    Map times through the piecewise linear warp taking each anchor time to
+    its target time. Beyond the first and last anchor the end segments are
+    extended, and a single anchor is a constant offset.
+
+    Parameters:
+        times: Times to map (ms)
+        anchors: Increasing anchor times (ms)
+        targets: Increasing target times of the anchors (ms)
+
+    Returns:
+        np.ndarray: Mapped times as floats
+    """
+    times = np.asarray(times, dtype=np.float64)
+    anchors = np.asarray(anchors, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    if len(anchors) == 1:
+        return times + (targets[0] - anchors[0])
+    mapped = np.interp(times, anchors, targets)
+    before = times < anchors[0]
+    mapped[before] = targets[0] + (times[before] - anchors[0]) * (targets[1] - targets[0]) / (anchors[1] - anchors[0])
+    after = times > anchors[-1]
+    mapped[after] = targets[-1] + (times[after] - anchors[-1]) * (targets[-1] - targets[-2]) / (
+        anchors[-1] - anchors[-2])
+    return mapped
+
+
+FRAME_RATE_SCALES = (1.0, 25 / 23.976, 23.976 / 25, 25 / 24, 24 / 25, 24 / 23.976, 23.976 / 24)
+GLOBAL_BINS = 1 << 17  # most bins alignCueStarts correlates a whole track in
+DRIFT_WINDOWS = 48  # most windows alignCueStarts estimates drift from
+
+
+def _onsetHistogram(times, origin: float, binSize: float, bins: int) -> np.ndarray:
+    index = np.floor((np.asarray(times, dtype=np.float64) - origin) / binSize).astype(np.int64)
+    index = index[(index >= 0) & (index < bins)]
+    return np.bincount(index, minlength=bins).astype(np.float64)
+
+
+def _referenceSpectrum(reference) -> np.ndarray:
+    """
+    Get the spectrum of a signal zero padded for _bestLag. The reference
+    is smeared over neighbouring bins first, cue timing is never exact.
+    """
+    reference = np.convolve(reference, [1.0, 2.0, 3.0, 2.0, 1.0], 'same')
+    return np.fft.rfft(reference, 1 << int(2 * len(reference) - 1).bit_length())
+
+
+def _bestLag(signal, referenceSpectrum, maxLag: int) -> tuple:
+    """
+    Cross-correlate a signal with an equally long reference with an FFT.
+
+    Returns:
+        (lag, peak): The shift of signal best matching reference, in bins
+        and within maxLag, and the correlation there
+    """
+    size = 2 * (len(referenceSpectrum) - 1)
+    correlation = np.fft.irfft(referenceSpectrum * np.conj(np.fft.rfft(signal, size)), size)
+    maxLag = min(maxLag, len(signal) - 1)
+    lags = np.concatenate((np.arange(0, maxLag + 1), np.arange(-maxLag, 0)))
+    values = correlation[lags]
+    best = int(np.argmax(values))
+    return int(lags[best]), float(values[best])
+
+
+def _matchOnsets(times, referenceStarts, tolerance: float) -> tuple:
+    """
+    Pair times with their nearest reference onset within tolerance.
+
+    Returns:
+        (matched, differences): Mask of the matched times, and the reference
+        onsets minus the matched times
+    """
+    right = np.clip(np.searchsorted(referenceStarts, times), 1, len(referenceStarts) - 1)
+    before = referenceStarts[right - 1] - times
+    after = referenceStarts[right] - times
+    differences = np.where(np.abs(before) <= np.abs(after), before, after)
+    matched = np.abs(differences) <= tolerance
+    return matched, differences[matched]
+
+
+def _fitLinear(starts, referenceStarts, scale: float, offset: float, tolerance: float) -> tuple:
+    """
+    Refine t' = scale * t + offset by a least squares fit of the start times
+    to the reference onsets they land near, within a tolerance narrowing
+    down to tolerance so that drift the offset alone misses is caught.
+
+    Returns:
+        (scale, offset, matches): The fit and the number of start times
+        within tolerance of a reference onset after it
+    """
+    for width in (8, 4, 2, 1, 1):
+        matched, differences = _matchOnsets(starts * scale + offset, referenceStarts, width * tolerance)
+        if np.count_nonzero(matched) < 2:
+            break
+        source = starts[matched]
+        target = source * scale + offset + differences
+        if np.ptp(source) > 0:
+            scale, offset = np.polyfit(source, target, 1)
+        else:
+            offset += float(np.median(differences))
+    matched, _ = _matchOnsets(starts * scale + offset, referenceStarts, tolerance)
+    return float(scale), float(offset), int(np.count_nonzero(matched))
+
+
+def _windowTargets(starts, referenceStarts, scales, binSize: float, maxOffset: float, window: float,
+                   count: int, minMatches: int) -> tuple:
+    """
+    Correlate short windows of the start times, at most count of them spread
+    over the track, with the reference onsets within maxOffset, each for the
+    best of the candidate scales. Windows are short enough that drift
+    between the scales is lost in the bins.
+
+    Returns:
+        (centres, targets): Window centres and where the reference puts them
+    """
+    centres = []
+    targets = []
+    for begin in np.linspace(starts[0], max(starts[0], starts[-1] - window), count):
+        inWindow = starts[np.searchsorted(starts, begin):np.searchsorted(starts, begin + window)]
+        if len(inWindow) < minMatches:
+            continue
+        centre = float(np.median(inWindow))
+        best = None
+        for scale in scales:
+            mapped = inWindow * scale
+            origin = mapped[0] - maxOffset
+            bins = int((mapped[-1] + maxOffset - origin) // binSize) + 1
+            nearby = referenceStarts[np.searchsorted(referenceStarts, origin):
+                                     np.searchsorted(referenceStarts, origin + bins * binSize)]
+            if len(nearby) < minMatches:
+                continue
+            reference = _referenceSpectrum(_onsetHistogram(nearby, origin, binSize, bins))
+            lag, peak = _bestLag(_onsetHistogram(mapped, origin, binSize, bins), reference, bins)
+            if best is None or peak > best[0]:
+                best = (peak, centre * scale + lag * binSize)
+        if best is not None:
+            centres.append(centre)
+            targets.append(best[1])
+    return np.array(centres), np.array(targets)
+
+
+def _fitRobust(centres, targets, tolerance: float) -> tuple:
+    """
+    Fit a line to window targets by trying the line through every pair of
+    them (RANSAC, exhaustively, there are few) and least squares fitting
+    the targets within tolerance of the line most of them are near, so that
+    windows correlating at the wrong place do not pull the fit.
+
+    Returns:
+        (scale, offset, inliers): The fit and the number of targets it fits
+    """
+    if len(centres) < 3:
+        return 1.0, 0.0, 0
+    first, second = np.triu_indices(len(centres), 1)
+    spans = centres[second] - centres[first]
+    valid = spans > 0
+    first, second, spans = first[valid], second[valid], spans[valid]
+    scales = (targets[second] - targets[first]) / spans
+    valid = scales > 0
+    first, scales = first[valid], scales[valid]
+    if len(scales) == 0:
+        return 1.0, 0.0, 0
+    offsets = targets[first] - scales * centres[first]
+    inliers = np.abs(targets[None, :] - (scales[:, None] * centres[None, :] + offsets[:, None])) <= tolerance
+    best = int(np.argmax(inliers.sum(axis=1)))
+    inlier = inliers[best]
+    if np.count_nonzero(inlier) < 3:
+        return 1.0, 0.0, 0
+    scale, offset = np.polyfit(centres[inlier], targets[inlier], 1)
+    return float(scale), float(offset), int(np.count_nonzero(inlier))
+
+
+def _warpPieces(starts, referenceStarts, scale: float, offset: float, binSize: int, window: int, search: int,
+                minMatches: int) -> tuple:
+    """
+    Correlate every window of the start times with the reference within
+    search of a linear re-timing, for the anchors of a piecewise warp.
+    """
+    first = float(starts[0])
+    last = float(starts[-1])
+    anchors = []
+    targets = []
+    for begin in np.arange(first, last, window):
+        inWindow = starts[np.searchsorted(starts, begin):np.searchsorted(starts, begin + window)]
+        if len(inWindow) < minMatches:
+            continue
+        mapped = inWindow * scale + offset
+        origin = mapped[0] - search
+        bins = int((mapped[-1] + search - origin) // binSize) + 1
+        nearby = referenceStarts[np.searchsorted(referenceStarts, origin):
+                                 np.searchsorted(referenceStarts, origin + bins * binSize)]
+        if len(nearby) < minMatches:
+            continue
+        reference = _referenceSpectrum(_onsetHistogram(nearby, origin, binSize, bins))
+        lag, _ = _bestLag(_onsetHistogram(mapped, origin, binSize, bins), reference, search // binSize)
+        matched, differences = _matchOnsets(mapped + lag * binSize, nearby, 2 * binSize)
+        if len(differences) < max(minMatches, len(inWindow) // 2):
+            continue
+        centre = float(np.median(inWindow[matched]))
+        anchors.append(centre)
+        targets.append(centre * scale + offset + lag * binSize + float(np.median(differences)))
+    if len(anchors) == 0:
+        return np.array([first, last]), np.array([first * scale + offset, last * scale + offset])
+    # drop pieces that would reverse the order of cues
+    keep = [0]
+    for i in range(1, len(anchors)):
+        if targets[i] > targets[keep[-1]]:
+            keep.append(i)
+    return np.array(anchors)[keep], np.array(targets)[keep]
+
+
+def alignCueStarts(starts, referenceStarts, piecewise: bool = True, binSize: int = 100,
+                   maxOffset: int = 600000, scales=FRAME_RATE_SCALES, window: int = 300000,
+                   search: int = 10000, minMatches: int = 8) -> tuple:
+    """
+    Estimate the re-timing of cues that best matches their start times to
+    the onsets of a reference track, such as the same subtitles in another
+    language timed against the right video.
+
+    The onsets are binned (in at most GLOBAL_BINS bins) and cross-correlated
+    with an FFT for every candidate scale (frame rate ratios by default).
+    Drift off those scales is found by correlating short windows of the
+    track on their own and fitting a line through the window offsets that
+    agree. The better of the two is refined by a least squares fit to the
+    onsets matched. With piecewise set, every window of the source is then
+    correlated again within search of the fit, for a piecewise linear warp
+    through the window centres that follows cuts and drift.
+
+    Parameters:
+        starts: Sorted start times to re-time (ms)
+        referenceStarts: Sorted start times of the reference (ms)
+        piecewise (bool): Estimate a warp rather than one linear re-timing
+        binSize (int): Bin width of the onset signals (ms)
+        maxOffset (int): Largest offset to consider (ms)
+        scales: Candidate time scales
+        window (int): Source time per piece of the warp (ms)
+        search (int): Largest offset of a piece from the linear fit (ms)
+        minMatches (int): Matched onsets a piece needs to count
+
+    Returns:
+        (anchors, targets): Arrays for warpTimes and CueStore.warped, two
+        anchors for a linear re-timing. Raises ValueError unless most cues
+        of the shorter track are within twice binSize of a cue of the other
+        after the re-timing.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    referenceStarts = np.asarray(referenceStarts, dtype=np.float64)
+    if len(starts) == 0 or len(referenceStarts) == 0:
+        raise ValueError('Nothing to align')
+    # one grid for all scales, coarser for very long tracks, the fit below is exact anyway
+    origin = min(starts[0] * min(scales), referenceStarts[0])
+    end = max(starts[-1] * max(scales), referenceStarts[-1])
+    coarse = max(binSize, (end - origin) / GLOBAL_BINS)
+    bins = int((end - origin) // coarse) + 1
+    reference = _referenceSpectrum(_onsetHistogram(referenceStarts, origin, coarse, bins))
+    best = None
+    for scale in scales:
+        lag, peak = _bestLag(_onsetHistogram(starts * scale, origin, coarse, bins), reference, int(maxOffset // coarse))
+        if best is None or peak > best[0]:
+            best = (peak, scale, lag * coarse)
+    _, scale, offset = best
+    fit = _fitLinear(starts, referenceStarts, scale, offset, 2 * binSize)
+    centres, targets = _windowTargets(starts, referenceStarts, scales, 2 * binSize, maxOffset, window / 5,
+                                      DRIFT_WINDOWS, minMatches)
+    scale, offset, inliers = _fitRobust(centres, targets, 5 * binSize)
+    if inliers > 0:
+        fit = max(fit, _fitLinear(starts, referenceStarts, scale, offset, 2 * binSize), key=lambda fit: fit[2])
+    scale, offset, matches = fit
+    needed = max(min(minMatches, len(starts), len(referenceStarts)), min(len(starts), len(referenceStarts)) // 2 + 1)
+    first = float(starts[0])
+    last = float(starts[-1])
+    if not piecewise or last - first < 2 * window or matches < needed // 2:
+        if last == first:
+            anchors, targets = np.array([first]), np.array([first * scale + offset])
+        else:
+            anchors, targets = np.array([first, last]), np.array([first * scale + offset, last * scale + offset])
+    else:
+        anchors, targets = _warpPieces(starts, referenceStarts, scale, offset, binSize, window, search, minMatches)
+    matched, _ = _matchOnsets(warpTimes(starts, anchors, targets), referenceStarts, 2 * binSize)
+    matches = int(np.count_nonzero(matched))
+    if matches < needed:
+        raise ValueError('No match with the reference found, %d of %d subtitles within %d ms of it' % (
+            matches, len(starts), 2 * binSize))
+    return anchors, targets
+
+
+def streamSize(stream) -> int:
+    """
+    Get the size of the stream in bytes, or -1 if it can not be determined.
+    """
+    try:
+        return os.fstat(stream.fileno()).st_size
+    except Exception:
+        pass
+    try:
+        pos = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(pos, os.SEEK_SET)
+        return size
+    except Exception:
+        return -1
+
+
+def streamPosition(stream) -> int:
+    """
+    Get the number of bytes consumed from the stream so far, or -1.
+
+    Text streams read ahead from their binary buffer, so this is accurate
+    to within one buffer size, which is plenty for progress reporting.
+    """
+    try:
+        buffer = getattr(stream, 'buffer', None)
+        return buffer.tell() if buffer is not None else stream.tell()
+    except Exception:
+        return -1
+
+
+def parseSRTBatches(stream, progress=None, interval: float = 0.05, cancelled=None,
+                    firstBatch: int = 0, batchInterval: float = None):
+    """
+    Parse a SubRip stream in a single pass, yielding the cues in batches.
+
+    Parameters:
+        stream: Text stream positioned at the start of the SubRip data
+        progress (callable): Called with the percentage of bytes consumed,
+            only when the percentage changes and at most once every
+            `interval` seconds (the final 100 is always reported)
+        interval (float): Minimum time between progress reports in seconds
+        cancelled (callable): Polled every few hundred lines, parsing stops
+            without yielding the pending cues once it returns True
+        firstBatch (int): Yield the first batch as soon as it has this many
+            cues, 0 to wait for batchInterval
+        batchInterval (float): Minimum time between the following batches in
+            seconds, None for a single batch at the end
+
+    Yields:
+        (starts, stops, texts): Arrays of start and stop times in milliseconds
+        and a list of the stripped cue texts, in file order
+    """
+    tstampLines = []
+    texts = []
+    total = streamSize(stream) if progress is not None else -1
+    lastPercent = -1
+    lastReport = 0.0
+    lastBatch = time.monotonic()
+    batchSize = firstBatch if firstBatch > 0 else -1
+
+    tsMatch = SRT_TSTAMP_LINE.match
+    idxMatch = SRT_INDEX_LINE.match
+    prevWasIndex = False
+    inText = False
+    textLines = []
+    tstampLine = ''
+    for lineno, line in enumerate(stream):
+        if inText:
+            if line.strip() != '':
+                textLines.append(line)
+            else:
+                tstampLines.append(tstampLine)
+                texts.append(''.join(textLines).strip())
+                inText = False
+                prevWasIndex = False
+                if len(texts) == batchSize:
+                    yield _tstampLinesToCues(tstampLines, texts)
+                    tstampLines = []
+                    texts = []
+                    batchSize = -1
+                    lastBatch = time.monotonic()
+        else:
+            if prevWasIndex and tsMatch(line) is not None:
+                tstampLine = line[:29]  # converted a batch at a time
+                textLines = []
+                inText = True
+                prevWasIndex = False
+            else:
+                if lineno == 0:
+                    line = line.lstrip('\ufeff')
+                prevWasIndex = idxMatch(line) is not None
+
+        if (lineno & 0x1ff) == 0:
+            if cancelled is not None and cancelled():
+                return
+            if total > 0:
+                percent = int(100 * streamPosition(stream) / total)
+                now = time.monotonic()
+                if percent != lastPercent and now - lastReport >= interval:
+                    lastPercent = percent
+                    lastReport = now
+                    progress(min(percent, 100))
+            if (batchInterval is not None and batchSize < 0 and len(texts) > 0
+                    and time.monotonic() - lastBatch >= batchInterval):
+                yield _tstampLinesToCues(tstampLines, texts)
+                tstampLines = []
+                texts = []
+                lastBatch = time.monotonic()
+    if inText and len(textLines) > 0:  # last cue without a trailing empty line
+        tstampLines.append(tstampLine)
+        texts.append(''.join(textLines).strip())
+    if progress is not None:
+        progress(100)
+    if len(texts) > 0 or (firstBatch <= 0 and batchInterval is None):
+        yield _tstampLinesToCues(tstampLines, texts)
+
+
+def parseSRTStream(stream, progress=None, interval: float = 0.05, cancelled=None):
+    """
+    Parse a SubRip stream in a single pass, see parseSRTBatches.
+
+    Returns:
+        (starts, stops, texts): Arrays of start and stop times in milliseconds
+        and a list of the stripped cue texts, in file order, or None if
+        cancelled
+    """
+    for starts, stops, texts in parseSRTBatches(stream, progress, interval, cancelled):
+        return starts, stops, texts
+    return None
+
+
+def _tstampLinesToCues(tstampLines: list, texts: list) -> tuple:
+    # the pattern only lets ASCII through, 29 characters per line
+    chars = np.frombuffer(''.join(tstampLines).encode('ascii'), dtype=np.uint8).reshape(-1, 29)
+    return _charsToTstamps(chars[:, 0:12]), _charsToTstamps(chars[:, 17:29]), texts
+
+
+def _decodeCueText(raw) -> str:
+    # same result as reading the lines in text mode and stripping them
+    text = bytes(raw).decode('utf-8', errors='replace')
+    return text.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+def validCues(starts, stops, texts: list):
+    """
+    Drop cues that can not be stored: negative start, stop not after start
+    or empty text. Texts are stripped.
+
+    Returns:
+        (starts, stops, texts, dropped): The remaining columns and the number
+        of cues dropped
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    stops = np.asarray(stops, dtype=np.int64)
+    texts = [text.strip() for text in texts]
+    keep = (starts >= 0) & (stops > starts) & np.array([len(text) > 0 for text in texts], dtype=bool)
+    if keep.all():
+        return starts, stops, texts, 0
+    rows = np.nonzero(keep)[0]
+    return starts[rows], stops[rows], [texts[i] for i in rows.tolist()], len(texts) - len(rows)
+
+
+def mapSRTFile(fileName: str):
+    """
+    Map a file into memory read-only.
+
+    Returns:
+        A buffer over the file contents without a UTF-8 byte order mark
+    """
+    with open(fileName, 'rb') as ifile:
+        if os.fstat(ifile.fileno()).st_size == 0:
+            return b''
+        mapped = mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if view[:3] == b'\xef\xbb\xbf':
+        return view[3:]
+    return view
+
+
+def unmapSRTFile(source) -> None:
+    """
+    Close a mapping from mapSRTFile. A mapped file can not be replaced or
+    removed on Windows, and truncating it elsewhere crashes the reader, so
+    nothing is left mapped once the file is loaded.
+    """
+    if isinstance(source, memoryview):
+        mapped = source.obj
+        source.release()
+        mapped.close()
+
+
+def scanSRTBuffer(buffer, progress=None, interval: float = 0.05, cancelled=None, batchSize: int = 65536):
+    """
+    Find the cues in undecoded SubRip data without decoding their texts.
+
+    Parameters:
+        buffer: bytes-like SubRip data, e.g. from mapSRTFile
+        progress, interval, cancelled: As for parseSRTBatches
+        batchSize (int): Timing lines converted at a time
+
+    Returns:
+        (starts, stops, spans): Arrays of start and stop times in
+        milliseconds and an (n, 2) array of the byte range of each cue
+        text in buffer, in file order, or None if cancelled
+    """
+    total = len(buffer)
+    spans = array.array('q')
+    tstampLines = []
+    starts = []
+    stops = []
+    lastReport = 0.0
+    lastPercent = -1
+    for idx, match in enumerate(SRT_CUE_BYTES.finditer(buffer)):
+        if match.start(2) == match.end():
+            continue  # timing line at the very end, no text and no empty line
+        tstampLines.append(match.group(1))
+        spans.extend(match.span(2))
+        if len(tstampLines) == batchSize:
+            chars = np.frombuffer(b''.join(tstampLines), dtype=np.uint8).reshape(-1, 29)
+            starts.append(_charsToTstamps(chars[:, 0:12]))
+            stops.append(_charsToTstamps(chars[:, 17:29]))
+            tstampLines = []
+        if (idx & 0xfff) == 0:
+            if cancelled is not None and cancelled():
+                return None
+            if progress is not None and total > 0:
+                percent = int(100 * match.end() / total)
+                now = time.monotonic()
+                if percent != lastPercent and now - lastReport >= interval:
+                    lastPercent = percent
+                    lastReport = now
+                    progress(percent)
+    chars = np.frombuffer(b''.join(tstampLines), dtype=np.uint8).reshape(-1, 29)
+    starts.append(_charsToTstamps(chars[:, 0:12]))
+    stops.append(_charsToTstamps(chars[:, 17:29]))
+    if progress is not None:
+        progress(100)
+    return (np.concatenate(starts), np.concatenate(stops),
+            np.frombuffer(spans, dtype=np.int64).reshape(-1, 2))
+
+
+def readMappedCueStore(fileName: str, progress=None, cancelled=None):
+    """
+    Load a SubRip file into a new CueStore through a read-only memory map.
+
+    Only the timing is parsed up front. The cue texts are copied out of the
+    mapping undecoded, without the numbers and timing lines around them,
+    and decoded when used, see TextArena. The mapping is closed after.
+
+    Returns:
+        (cues, dropped): As for readCueStore
+    """
+    source = mapSRTFile(fileName)
+    scanned = scanSRTBuffer(source, progress, cancelled=cancelled)
+    result = None if scanned is None else _mappedCueStore(source, *scanned)
+    unmapSRTFile(source)
+    return result
+
+
+def splitSRTBuffer(buffer, parts: int) -> list:
+    """
+    Split undecoded SubRip data into at most parts (begin, end) byte ranges
+    of about the same size, at cue boundaries (see SRT_CUE_BOUNDARY).
+    Scanning the ranges one by one finds the same cues as scanning it all.
+    """
+    total = len(buffer)
+    ranges = []
+    begin = 0
+    for part in range(1, parts):
+        if begin >= total:
+            break
+        match = SRT_CUE_BOUNDARY.search(buffer, max(begin, total * part // parts))
+        if match is None:
+            break
+        ranges.append((begin, match.end()))
+        begin = match.end()
+    ranges.append((begin, total))
+    return ranges
+
+
+def readParallelCueStore(fileName: str, jobs: int = None, progress=None, cancelled=None,
+                         minChunkSize: int = 4 * 1024 * 1024):
+    """
+    Load a SubRip file like readMappedCueStore, scanning chunks of it in a
+    pool of worker processes.
+
+    The file is split at cue boundaries into a few chunks per worker. The
+    workers map the file themselves and return only the timing and text
+    byte ranges, which are concatenated in file order. Validation and the
+    overlap check run once on the result.
+
+    Parameters:
+        fileName (str): SubRip file to load
+        jobs (int): Number of worker processes, None for one per CPU core
+        progress (callable): Called with the percentage of chunks done
+        cancelled (callable): Polled as chunks complete, the pool is
+            stopped and None is returned once it returns True
+        minChunkSize (int): Smallest chunk in bytes, small files are loaded
+            without a pool
+
+    Returns:
+        (cues, dropped): As for readCueStore
+    """
+    jobs = jobs or os.cpu_count() or 1
+    source = mapSRTFile(fileName)
+    parts = min(jobs * 4, len(source) // minChunkSize)
+    if jobs <= 1 or parts <= 1:
+        unmapSRTFile(source)
+        return readMappedCueStore(fileName, progress, cancelled)
+    tasks = [(fileName, begin, end) for begin, end in splitSRTBuffer(source, parts)]
+    results = []
+    try:
+        # spawn, the caller may have threads (a GUI) that fork would copy in odd states
+        with multiprocessing.get_context('spawn').Pool(min(jobs, len(tasks))) as pool:
+            for result in pool.imap(_scanSRTFileRange, tasks):
+                if cancelled is not None and cancelled():
+                    return None
+                results.append(result)
+                if progress is not None:
+                    progress(int(100 * len(results) / len(tasks)))
+        return _mappedCueStore(source, np.concatenate([result[0] for result in results]),
+                               np.concatenate([result[1] for result in results]),
+                               np.concatenate([result[2] for result in results]))
+    finally:
+        unmapSRTFile(source)
+
+
+def _scanSRTFileRange(task: tuple) -> tuple:
+    # pool entry point: (fileName, begin, end) -> scanSRTBuffer result, spans relative to the file
+    fileName, begin, end = task
+    source = mapSRTFile(fileName)
+    starts, stops, spans = scanSRTBuffer(source[begin:end])
+    unmapSRTFile(source)
+    return starts, stops, spans + begin
+
+
+def _copySpans(source, spans, batchSize: int = 65536) -> tuple:
+    """
+    Copy the byte ranges spans of source end to end, a batch of ranges at a
+    time so that the gather index stays small.
+
+    Returns:
+        (data, spans): A bytearray of the ranges and their spans in it
+    """
+    lengths = spans[:, 1] - spans[:, 0]
+    copied = np.empty_like(spans)
+    np.cumsum(lengths, out=copied[:, 1])
+    copied[:, 0] = copied[:, 1] - lengths
+    data = bytearray(int(copied[-1, 1]) if len(spans) > 0 else 0)
+    target = np.frombuffer(data, dtype=np.uint8)
+    origin = np.frombuffer(source, dtype=np.uint8)
+    for first in range(0, len(spans), batchSize):
+        last = min(first + batchSize, len(spans))
+        begin, end = int(copied[first, 0]), int(copied[last - 1, 1])
+        target[begin:end] = origin[np.arange(begin, end) + np.repeat(spans[first:last, 0] - copied[first:last, 0],
+                                                                     lengths[first:last])]
+    del target, origin  # release the buffers, so that the mapping can be closed
+    return data, copied
+
+
+def _mappedCueStore(source, starts, stops, spans) -> tuple:
+    # the pattern only takes non-empty text lines, so empty texts have empty spans
+    keep = (starts >= 0) & (stops > starts) & (spans[:, 1] > spans[:, 0])
+    dropped = len(keep) - int(np.count_nonzero(keep))
+    if dropped > 0:
+        starts, stops, spans = starts[keep], stops[keep], spans[keep]
+    # only the texts are kept, the mapped file is closed after loading
+    textBase, spans = _copySpans(source, spans)
+    cues = CueStore(len(starts), textBase)
+    dropped += cues.extend(starts, stops, spans=spans, replace=True)
+    return cues, dropped
+
+
+def readCueStore(stream, progress=None, cancelled=None):
+    """
+    Parse a SubRip stream into a new CueStore, see parseSRTStream.
+
+    Returns:
+        (cues, dropped): The store and the number of cues left out, invalid
+        ones or ones replaced by a later cue with the same timing, or None
+        if cancelled
+    """
+    parsed = parseSRTStream(stream, progress, cancelled=cancelled)
+    if parsed is None:
+        return None
+    starts, stops, texts, dropped = validCues(*parsed)
+    cues = CueStore(len(texts))
+    dropped += cues.extend(starts, stops, texts, replace=True)
+    return cues, dropped
+
+
+CUE_CACHE_MAGIC = b'SRTCACHE'
+# magic, version, count, overlapping rows, text bytes, playback position; arrays follow at CUE_CACHE_DATA
+CUE_CACHE_HEADER = struct.Struct('<8sq4q')
+CUE_CACHE_VERSION = 1
+CUE_CACHE_DATA = 64
+CUE_CACHE_SUFFIX = '.srtcache'
+
+
+def hashSRTFile(fileName: str) -> str:
+    """
+    Get a hash of the contents of a file, as hex.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(fileName, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cueCacheName(directory: str, fileName: str) -> str:
+    """
+    Get the cache file for the current contents of a SubRip file.
+    """
+    return os.path.join(directory, hashSRTFile(fileName) + CUE_CACHE_SUFFIX)
+
+
+def writeCueCache(cacheName: str, starts, stops, texts, position: int = -1, keep: int = 20) -> None:
+    """
+    Write cues to a binary cache file atomically: the start, stop and text
+    range arrays, the overlapping rows, the UTF-8 texts and a playback
+    position. Only the keep most recently written cache files in the
+    directory are kept.
+
+    Parameters:
+        texts (CueTexts): Texts, e.g. a copy of CueStore.texts, which are
+            written as stored without decoding them
+    """
+    starts = np.ascontiguousarray(starts, dtype='<i8')
+    stops = np.ascontiguousarray(stops, dtype='<i8')
+    raw = texts.arena.raw
+    parts = [raw(begin, end) for begin, end in texts.spans.tolist()]
+    lengths = np.fromiter(map(len, parts), dtype=np.int64, count=len(parts))
+    spans = np.empty((len(parts), 2), dtype='<i8')
+    spans[:, 1] = np.cumsum(lengths)
+    spans[:, 0] = spans[:, 1] - lengths
+    overlaps = (np.nonzero(starts[1:] < stops[:-1])[0] + 1).astype('<i8')
+    textBytes = b''.join(parts)
+    header = CUE_CACHE_HEADER.pack(CUE_CACHE_MAGIC, CUE_CACHE_VERSION, len(starts), len(overlaps),
+                                   len(textBytes), position)
+
+    directory = os.path.dirname(os.path.abspath(cacheName))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmpName = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+    try:
+        with open(fd, 'wb') as stream:
+            stream.write(header.ljust(CUE_CACHE_DATA, b'\0'))
+            for values in (starts, stops, spans, overlaps):
+                stream.write(values.tobytes())
+            stream.write(textBytes)
+        os.replace(tmpName, cacheName)
+    except BaseException:
+        try:
+            os.remove(tmpName)
+        except OSError:
+            pass
+        raise
+    cached = sorted([os.path.join(directory, name) for name in os.listdir(directory)
+                     if name.endswith(CUE_CACHE_SUFFIX)], key=os.path.getmtime)
+    for name in cached[:max(len(cached) - keep, 0)]:
+        os.remove(name)
+
+
+def readCueCache(cacheName: str):
+    """
+    Open a cache file written by writeCueCache. It is read in one go into a
+    buffer the arrays and texts use as they are, so nothing is parsed or
+    decoded, and the file is not kept open to be replaced or pruned.
+
+    Returns:
+        (cues, position): The store and the playback position, or None if
+        there is no valid cache file
+    """
+    try:
+        with open(cacheName, 'rb') as stream:
+            size = os.fstat(stream.fileno()).st_size
+            if size < CUE_CACHE_DATA:
+                return None
+            data = bytearray(size)
+            if stream.readinto(data) != size:
+                return None
+    except OSError:
+        return None
+    magic, version, count, overlapCount, textBytes, position = CUE_CACHE_HEADER.unpack_from(data, 0)
+    if (magic != CUE_CACHE_MAGIC or version != CUE_CACHE_VERSION or
+            size != CUE_CACHE_DATA + 8 * (4 * count + overlapCount) + textBytes):
+        return None
+    offset = CUE_CACHE_DATA
+    starts = np.frombuffer(data, dtype=np.int64, count=count, offset=offset)
+    stops = np.frombuffer(data, dtype=np.int64, count=count, offset=offset + 8 * count)
+    spans = np.frombuffer(data, dtype=np.int64, count=2 * count, offset=offset + 16 * count).reshape(count, 2)
+    offset += 32 * count
+    overlaps = np.frombuffer(data, dtype=np.int64, count=overlapCount, offset=offset)
+    offset += 8 * overlapCount
+    textBase = memoryview(data)[offset:offset + textBytes]
+    return CueStore.fromArrays(starts, stops, spans, textBase, overlaps.tolist()), position
+
+
+def setCueCachePosition(cacheName: str, position: int) -> None:
+    """
+    Update the playback position stored in a cache file.
+    """
+    with open(cacheName, 'r+b') as stream:
+        stream.seek(CUE_CACHE_HEADER.size - 8)
+        stream.write(struct.pack('<q', position))
+
+
+def formatSRTChunks(starts, stops, texts: list, chunkSize: int = 4096):
+    """
+    Generate SubRip text for the given cues, chunkSize cues at a time.
+    """
+    for first in range(0, len(texts), chunkSize):
+        last = min(first + chunkSize, len(texts))
+        startStrs = tstampsToStr(starts[first:last])
+        stopStrs = tstampsToStr(stops[first:last])
+        yield ''.join(['%d\n%s --> %s\n%s\n\n' % (first + i + 1, startStrs[i], stopStrs[i], text)
+                       for i, text in enumerate(texts[first:last])])
+
+
+def writeSRTFile(fileName: str, starts, stops, texts: list, chunkSize: int = 4096) -> None:
+    """
+    Write cues to a SubRip file atomically.
+
+    The data goes to a temporary file next to fileName, which is synced to
+    disk and then renamed over fileName, so an interrupted save leaves the
+    old file untouched.
+    """
+    fileName = os.path.abspath(fileName)
+    directory = os.path.dirname(fileName)
+    try:
+        mode = os.stat(fileName).st_mode & 0o777
+    except OSError:
+        mode = None
+    fd, tmpName = tempfile.mkstemp(prefix='.%s.' % (os.path.basename(fileName)),
+                                   suffix='.tmp', dir=directory)
+    try:
+        with open(fd, 'w', encoding='utf-8') as stream:
+            for chunk in formatSRTChunks(starts, stops, texts, chunkSize):
+                stream.write(chunk)
+            stream.flush()
+            os.fsync(stream.fileno())
+        if mode is None:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmpName, mode)
+        os.replace(tmpName, fileName)
+    except BaseException:
+        try:
+            os.remove(tmpName)
+        except OSError:
+            pass
+        raise
+    if os.name == 'posix':  # make the rename itself durable
+        dirfd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
+
+
+def _pairKeys(starts, stops) -> np.ndarray:
+    """
+    One comparable (and sortable) value per start and stop pair.
+    """
+    pairs = np.empty((len(starts), 2), dtype=np.int64)
+    pairs[:, 0] = starts
+    pairs[:, 1] = stops
+    return pairs.view(np.dtype((np.void, 16))).ravel()
+
+
+class TextArena(object):
+    """
+    Cue texts as UTF-8 in one growing buffer, addressed by (begin, end) byte
+    ranges.
+
+    Addresses below the length of the optional base buffer (an undecoded
+    SubRip file) refer to raw cue text in it, which is normalized when decoded.
+    Texts added later are appended after it. Short texts are interned, so
+    repeats such as "♪" or speaker tags share one range. Nothing is ever
+    overwritten, so a copied range array stays readable while the store it
+    came from is edited.
+    """
+    InternLength = 32  # bytes, longer texts are rarely repeated verbatim
+    InternCount = 4096  # distinct interned texts at most, common repeats show up early
+
+    def __init__(self, base=b''):
+        self.base = base
+        self.offset = len(base)
+        self.data = bytearray()
+        self.interned = {}  # UTF-8 text -> begin
+
+    def __len__(self) -> int:
+        """
+        Size in bytes, base included.
+        """
+        return self.offset + len(self.data)
+
+    def add(self, text: str) -> tuple:
+        """
+        Store text and return its (begin, end) range.
+        """
+        raw = text.encode('utf-8')
+        if len(raw) <= self.InternLength:
+            begin = self.interned.get(raw)
+            if begin is not None:
+                return begin, begin + len(raw)
+        begin = self.offset + len(self.data)
+        self.data += raw
+        if len(raw) <= self.InternLength and len(self.interned) < self.InternCount:
+            self.interned[raw] = begin
+        return begin, begin + len(raw)
+
+    def addMany(self, texts) -> np.ndarray:
+        """
+        Store texts and return their ranges as an (n, 2) array.
+        """
+        encoded = [text.encode('utf-8') for text in texts]
+        interned = self.interned
+        internLength = self.InternLength
+        parts = []
+        begins = []
+        position = self.offset + len(self.data)
+        for raw in encoded:
+            if len(raw) <= internLength:
+                begin = interned.get(raw)
+                if begin is None:
+                    begin = position
+                    position += len(raw)
+                    parts.append(raw)
+                    if len(interned) < self.InternCount:
+                        interned[raw] = begin
+            else:
+                begin = position
+                position += len(raw)
+                parts.append(raw)
+            begins.append(begin)
+        self.data += b''.join(parts)
+        spans = np.empty((len(encoded), 2), dtype=np.int64)
+        spans[:, 0] = begins
+        spans[:, 1] = spans[:, 0] + np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        return spans
+
+    def get(self, begin: int, end: int) -> str:
+        offset = self.offset
+        if begin < offset:
+            return _decodeCueText(self.base[begin:end])
+        return self.data[begin - offset:end - offset].decode('utf-8')
+
+    def raw(self, begin: int, end: int) -> bytes:
+        """
+        Get the stored UTF-8 bytes of a range, undecoded.
+        """
+        offset = self.offset
+        if begin < offset:
+            return bytes(self.base[begin:end])
+        return bytes(self.data[begin - offset:end - offset])
+
+
+class CueTexts(object):
+    """
+    Read-only sequence of cue texts in a TextArena, decoded on access.
+    """
+
+    def __init__(self, arena: TextArena, spans: np.ndarray):
+        self.arena = arena
+        self.spans = spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            get = self.arena.get
+            return [get(begin, end) for begin, end in self.spans[index].tolist()]
+        begin, end = self.spans[index]
+        return self.arena.get(begin, end)
+
+    def __iter__(self):
+        get = self.arena.get
+        for first in range(0, len(self.spans), 4096):
+            for begin, end in self.spans[first:first + 4096].tolist():
+                yield get(begin, end)
+
+    def copy(self):
+        """
+        Snapshot that stays valid while the store is edited.
+        """
+        return CueTexts(self.arena, self.spans.copy())
+
+
+class CueStore(object):
+    """
+    Subtitle cues kept sorted by start time, stored column-wise.
+
+    Start and stop times (milliseconds) live in contiguous int64 arrays with
+    spare capacity at the end, texts live in a TextArena with a parallel
+    array of their byte ranges. Cues with the same start keep their
+    insertion order.
+
+    For the active cue lookup the store also keeps the running maximum of
+    the stop times (valid up to the first row changed since the last
+    lookup) and a cursor remembering where the previous lookup ended.
+
+    Overlaps are tracked as the set of rows that start before the previous
+    row stops. Single edits only re-check their neighbours, bulk changes
+    re-check everything in one vectorized pass.
+
+    With a text base (an undecoded SubRip file) the texts of the loaded cues
+    stay in it and are decoded when used, see TextArena.
+    """
+
+    def __init__(self, capacity: int = 64, textBase=b''):
+        self._starts = np.empty(max(capacity, 1), dtype=np.int64)
+        self._stops = np.empty(max(capacity, 1), dtype=np.int64)
+        self._maxStops = np.empty(max(capacity, 1), dtype=np.int64)
+        self._spans = np.empty((max(capacity, 1), 2), dtype=np.int64)  # text ranges in _arena
+        self._arena = TextArena(textBase)
+        self._maxValid = 0
+        self._count = 0
+        self._cursor = None  # (position, first candidate row, first row starting after position)
+        self._overlaps = set()  # rows i with starts[i] < stops[i - 1]
+
+    @classmethod
+    def fromArrays(cls, starts: np.ndarray, stops: np.ndarray, spans: np.ndarray, textBase=b'', overlaps=None):
+        """
+        Make a store using sorted arrays as they are, with spans addressing
+        texts in textBase. They are written to on edits, so they must be
+        writable, not views of bytes. The overlaps
+        are checked unless given as the rows starting before the previous
+        row stops.
+        """
+        if len(starts) == 0:
+            return cls(textBase=textBase)
+        cues = cls(1, textBase)
+        cues._starts = starts
+        cues._stops = stops
+        cues._spans = spans
+        cues._maxStops = np.empty(len(starts), dtype=np.int64)
+        cues._count = len(starts)
+        if overlaps is None:
+            cues.checkOverlaps()
+        else:
+            cues._overlaps = set(overlaps)
+        return cues
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def starts(self) -> np.ndarray:
+        """
+        Start times in milliseconds. The returned view is only valid until
+        the store is modified.
+        """
+        return self._starts[:self._count]
+
+    @property
+    def stops(self) -> np.ndarray:
+        """
+        Stop times in milliseconds. The returned view is only valid until
+        the store is modified.
+        """
+        return self._stops[:self._count]
+
+    @property
+    def texts(self) -> CueTexts:
+        """
+        Cue texts, decoded as they are read. The returned sequence is only
+        valid until the store is modified, use its copy() to keep it.
+        """
+        return CueTexts(self._arena, self._spans[:self._count])
+
+    @property
+    def spans(self) -> np.ndarray:
+        """
+        (n, 2) byte ranges of the texts in the text arena. The returned view
+        is only valid until the store is modified.
+        """
+        return self._spans[:self._count]
+
+    def text(self, row: int) -> str:
+        begin, end = self._spans[row]
+        return self._arena.get(begin, end)
+
+    def item(self, row: int) -> tuple:
+        """
+        Get the (start, stop, text) tuple at row.
+        """
+        return int(self._starts[row]), int(self._stops[row]), self.text(row)
+
+    def insertionRow(self, start: int) -> int:
+        """
+        Get the row a new cue starting at start would be inserted at.
+        """
+        return int(np.searchsorted(self.starts, start, side='right'))
+
+    def findRows(self, start: int, stop: int) -> np.ndarray:
+        """
+        Get the rows of all cues with exactly this start and stop.
+        """
+        starts = self.starts
+        lo = int(np.searchsorted(starts, start, side='left'))
+        hi = int(np.searchsorted(starts, start, side='right'))
+        return lo + np.nonzero(self._stops[lo:hi] == stop)[0]
+
+    def insert(self, start: int, stop: int, text: str) -> int:
+        """
+        Insert a cue at its sorted position and return its row.
+        """
+        row = self.insertionRow(start)
+        n = self._count
+        self._reserve(n + 1)
+        self._starts[row + 1:n + 1] = self._starts[row:n]
+        self._stops[row + 1:n + 1] = self._stops[row:n]
+        self._spans[row + 1:n + 1] = self._spans[row:n]
+        self._starts[row] = start
+        self._stops[row] = stop
+        self._spans[row] = self._arena.add(text)
+        self._count = n + 1
+        self._invalidate(row)
+        # the old pair (row - 1, row) is split up by the new cue
+        self._overlaps = {i if i < row else i + 1 for i in self._overlaps if i != row}
+        self._checkOverlap(row)
+        self._checkOverlap(row + 1)
+        return row
+
+    def remove(self, row: int) -> None:
+        """
+        Remove the cue at row.
+        """
+        n = self._count
+        if row < 0 or row >= n:
+            raise IndexError('CueStore::remove(): Row %d out of range' % (row))
+        self._starts[row:n - 1] = self._starts[row + 1:n]
+        self._stops[row:n - 1] = self._stops[row + 1:n]
+        self._spans[row:n - 1] = self._spans[row + 1:n]
+        self._count = n - 1
+        self._invalidate(row)
+        self._overlaps = {i if i < row else i - 1 for i in self._overlaps
+                          if i != row and i != row + 1}
+        self._checkOverlap(row)
+
+    def removeRows(self, rows) -> None:
+        """
+        Remove the cues at rows, all in one pass.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        n = self._count
+        keep = np.ones(n, dtype=bool)
+        keep[rows] = False
+        count = int(np.count_nonzero(keep))
+        self._starts[:count] = self._starts[:n][keep]
+        self._stops[:count] = self._stops[:n][keep]
+        self._spans[:count] = self._spans[:n][keep]
+        self._count = count
+        self._invalidate(int(rows.min()))
+        self.checkOverlaps()
+
+    def matchRows(self, starts, stops) -> np.ndarray:
+        """
+        Get the sorted rows of all cues whose start and stop are one of the
+        given pairs.
+        """
+        if self._count == 0 or len(starts) == 0:
+            return np.zeros(0, dtype=np.int64)
+        mask = np.isin(_pairKeys(self.starts, self.stops), _pairKeys(starts, stops))
+        return np.nonzero(mask)[0]
+
+    def isAppend(self, starts, replace: bool = False) -> bool:
+        """
+        Check if cues with these start times, in this order, would all be
+        added after the existing ones. With replace set (see extend), also
+        check that no start repeats, so that no cue can replace another.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        if len(starts) == 0:
+            return True
+        if self._count > 0:
+            last = self._starts[self._count - 1]
+            if starts[0] < last or (replace and starts[0] == last):
+                return False
+        if replace:
+            return bool(np.all(starts[1:] > starts[:-1]))
+        return bool(np.all(starts[1:] >= starts[:-1]))
+
+    def extend(self, starts, stops, texts=None, spans=None, replace: bool = False) -> int:
+        """
+        Add many cues at once with a single merge. Sorted cues starting after
+        the existing ones are appended without re-sorting.
+
+        Instead of the texts, the (n, 2) byte ranges of texts already in the
+        text base can be given as spans.
+
+        With replace set, a cue with the same start and stop as an existing
+        one, or as an earlier one of the new cues, replaces it, as a single
+        edit would. Returns the number of cues replaced.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+        if len(starts) == 0:
+            return 0
+        if spans is None:
+            spans = self._arena.addMany(texts)
+        n = self._count
+        if self.isAppend(starts, replace):
+            total = n + len(starts)
+            self._reserve(total)
+            self._starts[n:total] = starts
+            self._stops[n:total] = stops
+            self._spans[n:total] = spans
+            self._count = total
+            self._invalidate(n)
+            first = max(n - 1, 0)
+            overlaps = np.nonzero(self._starts[first + 1:total] < self._stops[first:total - 1])[0] + first + 1
+            self._overlaps.update(overlaps.tolist())
+            return 0
+        allStarts = np.concatenate((self.starts, starts))
+        allStops = np.concatenate((self.stops, stops))
+        allSpans = np.concatenate((self.spans, spans))
+        order = np.argsort(allStarts, kind='stable')
+        replaced = 0
+        if replace:
+            # equal (start, stop) pairs end up next to each other, in the order
+            # they were added, keep the last of each run
+            pairs = np.lexsort((allStops, allStarts))
+            same = ((allStarts[pairs[1:]] == allStarts[pairs[:-1]]) &
+                    (allStops[pairs[1:]] == allStops[pairs[:-1]]))
+            replaced = int(np.count_nonzero(same))
+            if replaced > 0:
+                keep = np.ones(len(allStarts), dtype=bool)
+                keep[pairs[:-1][same]] = False
+                order = order[keep[order]]
+        total = len(order)
+        self._reserve(total)
+        self._starts[:total] = allStarts[order]
+        self._stops[:total] = allStops[order]
+        self._spans[:total] = allSpans[order]
+        self._count = total
+        self._invalidate(0)
+        self.checkOverlaps()
+        return replaced
+
+    def setText(self, row: int, text: str) -> None:
+        self._spans[row] = self._arena.add(text)
+
+    def shift(self, delta: int) -> None:
+        """
+        Move every cue by delta milliseconds. Order is unchanged.
+        """
+        self.starts[:] += delta
+        self.stops[:] += delta
+        self._maxStops[:self._maxValid] += delta
+        self._cursor = None
+
+    def retimed(self, scale: float, offset: float, first: int = 0, last: int = None) -> tuple:
+        """
+        Compute the linear re-timing t' = scale * t + offset of the cues at
+        rows first to last (exclusive), in whole milliseconds. Cues keep at
+        least 1 ms, and a cue that would end up with the start and stop of
+        another one is made 1 ms longer. Nothing is changed, see moveCues.
+
+        Returns:
+            (starts, stops): The new times of the rows
+        """
+        if not scale > 0:
+            raise ValueError('CueStore::retimed(): Scale must be positive')
+        return self._retimed(lambda times: times * scale + offset, first, last)
+
+    def warped(self, anchors, targets, first: int = 0, last: int = None) -> tuple:
+        """
+        Compute the piecewise linear re-timing of the cues at rows first to
+        last (exclusive) taking the anchor times to the target times, see
+        warpTimes. Returns the same as retimed.
+        """
+        if len(anchors) == 0 or len(anchors) != len(targets):
+            raise ValueError('CueStore::warped(): Need as many targets as anchors')
+        if np.any(np.diff(anchors) <= 0) or np.any(np.diff(targets) <= 0):
+            raise ValueError('CueStore::warped(): Anchors and targets must increase')
+        return self._retimed(lambda times: warpTimes(times, anchors, targets), first, last)
+
+    def _retimed(self, transform, first: int, last: int) -> tuple:
+        last = self._count if last is None else last
+        starts = np.rint(transform(self._starts[first:last])).astype(np.int64)
+        stops = np.rint(transform(self._stops[first:last])).astype(np.int64)
+        np.maximum(stops, starts + 1, out=stops)
+        if len(starts) > 0:
+            stops = self._separated(first, starts, stops)
+        return starts, stops
+
+    def _separated(self, first: int, starts, stops) -> np.ndarray:
+        """
+        Lengthen the new cues at rows from first on until their start and
+        stop pairs are unique in the store, as the edit history needs.
+        """
+        last = first + len(starts)
+        allStarts = self.starts.copy()
+        allStarts[first:last] = starts
+        # equal pairs need equal starts, which re-timing with a scale rarely makes
+        sortedStarts = np.sort(allStarts, kind='stable')
+        if not np.any(sortedStarts[1:] == sortedStarts[:-1]):
+            return stops
+        allStops = self.stops.copy()
+        allStops[first:last] = stops
+        moved = np.zeros(len(allStarts), dtype=bool)
+        moved[first:last] = True
+        while True:
+            order = np.lexsort((moved, allStops, allStarts))  # a moved cue after an unmoved one with its pair
+            same = np.nonzero((allStarts[order][1:] == allStarts[order][:-1]) &
+                              (allStops[order][1:] == allStops[order][:-1]))[0] + 1
+            rows = order[same]
+            rows = rows[moved[rows]]
+            if len(rows) == 0:
+                return allStops[first:last]
+            allStops[rows] += 1
+
+    def findPairs(self, starts, stops) -> np.ndarray:
+        """
+        Get the row of the cue with each of the given start and stop pairs.
+        Raises ValueError if one is missing.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+        n = self._count
+        rows = np.searchsorted(self.starts, starts, 'left')
+        # walk cues with the same start, a few at most
+        missing = np.ones(len(rows), dtype=bool)
+        while True:
+            candidates = np.nonzero(missing)[0]
+            if len(candidates) == 0:
+                return rows
+            inside = rows[candidates] < n
+            if not inside.all() or np.any(self._starts[rows[candidates]] != starts[candidates]):
+                raise ValueError('CueStore::findPairs(): No cue from %d to %d' % (
+                    starts[candidates[0]], stops[candidates[0]]))
+            found = self._stops[rows[candidates]] == stops[candidates]
+            missing[candidates[found]] = False
+            rows[candidates[~found]] += 1
+
+    def moveCues(self, fromStarts, fromStops, starts, stops):
+        """
+        Give the cues with the start and stop pairs fromStarts and fromStops
+        the new ones in starts and stops, keeping the store sorted.
+
+        Returns:
+            np.ndarray: The sorted rows of the cues, or None if rows moved
+        """
+        rows = self.findPairs(fromStarts, fromStops)
+        self._starts[rows] = starts
+        self._stops[rows] = stops
+        self._cursor = None
+        allStarts = self.starts
+        if np.all(allStarts[1:] >= allStarts[:-1]):
+            self._invalidate(int(rows.min()) if len(rows) > 0 else 0)
+            self.checkOverlaps()
+            return np.sort(rows)
+        order = np.argsort(allStarts, kind='stable')
+        n = self._count
+        self._starts[:n] = self._starts[:n][order]
+        self._stops[:n] = self._stops[:n][order]
+        self._spans[:n] = self._spans[:n][order]
+        self._invalidate(0)
+        self.checkOverlaps()
+        return None
+
+    def setTimes(self, first: int, starts, stops) -> None:
+        """
+        Set the start and stop of the cues from row first on, as many as given.
+        The caller keeps the store sorted, e.g. for the whole store retimed.
+        """
+        last = first + len(starts)
+        self._starts[first:last] = starts
+        self._stops[first:last] = stops
+        self._invalidate(first)
+        self.checkOverlaps()
+
+    def clear(self) -> None:
+        self._arena = TextArena()
+        self._count = 0
+        self._invalidate(0)
+        self._overlaps = set()
+
+    def checkOverlaps(self) -> None:
+        """
+        Re-check every pair of neighbouring cues for overlaps.
+        """
+        starts = self.starts
+        stops = self.stops
+        self._overlaps = set((np.nonzero(starts[1:] < stops[:-1])[0] + 1).tolist())
+
+    def badRows(self) -> list:
+        """
+        Get the sorted rows of all cues overlapping a neighbour.
+        """
+        rows = set()
+        for i in self._overlaps:
+            rows.add(i - 1)
+            rows.add(i)
+        return sorted(rows)
+
+    def activeRows(self, position: int) -> list:
+        """
+        Get the rows of all cues with start < position < stop.
+
+        Rows starting before position form a prefix of the store, and the
+        ones that have not ended yet begin where the running maximum of the
+        stop times first exceeds position. Successive lookups with a
+        slowly increasing position (playback) move the previous bounds
+        forward by a step or two, anything else is two binary searches.
+        """
+        n = self._count
+        if n == 0:
+            return []
+        self._updateMaxStops()
+        starts = self._starts
+        maxStops = self._maxStops
+        cursor = self._cursor
+        lo = hi = -1
+        if cursor is not None and position >= cursor[0]:
+            lo, hi = cursor[1], cursor[2]
+            for _ in range(4):
+                if hi < n and starts[hi] < position:
+                    hi += 1
+                elif lo < n and maxStops[lo] <= position:
+                    lo += 1
+                else:
+                    break
+            else:
+                lo = hi = -1  # jumped too far, search instead
+        if lo < 0:
+            hi = int(np.searchsorted(starts[:n], position, side='left'))
+            lo = int(np.searchsorted(maxStops[:n], position, side='right'))
+        self._cursor = (position, lo, hi)
+        if lo >= hi:
+            return []
+        if hi - lo <= 8:
+            stops = self._stops
+            return [i for i in range(lo, hi) if stops[i] > position]
+        return (lo + np.nonzero(self._stops[lo:hi] > position)[0]).tolist()
+
+    def nextBoundary(self, position: int) -> int:
+        """
+        Get the first time after position at which activeRows changes, that
+        is the earliest start + 1 or stop of an active cue, -1 if none.
+        """
+        n = self._count
+        if n == 0:
+            return -1
+        boundary = -1
+        row = int(np.searchsorted(self._starts[:n], position, side='left'))
+        if row < n:
+            boundary = int(self._starts[row]) + 1
+        rows = self.activeRows(position)
+        if len(rows) > 0:
+            stop = int(self._stops[rows].min())
+            boundary = stop if boundary < 0 else min(boundary, stop)
+        return boundary
+
+    def previousStart(self, position: int) -> int:
+        """
+        Get the row of the last cue starting before position, -1 if none.
+        """
+        return int(np.searchsorted(self.starts, position, side='left')) - 1
+
+    def startRows(self, begin: int = None, end: int = None) -> tuple:
+        """
+        Get the rows first to last (exclusive) of the cues starting at or
+        after begin and before end, either left out for no limit.
+        """
+        starts = self.starts
+        first = 0 if begin is None else int(np.searchsorted(starts, begin, 'left'))
+        last = self._count if end is None else int(np.searchsorted(starts, end, 'left'))
+        return first, max(first, last)
+
+    def nextStart(self, position: int) -> int:
+        """
+        Get the row of the first cue starting after position, -1 if none.
+        """
+        row = int(np.searchsorted(self.starts, position, side='right'))
+        return row if row < self._count else -1
+
+    def cueAt(self, position: int) -> int:
+        """
+        Get the row of the cue with start <= position < stop, the latest
+        starting one if several overlap there, -1 if none.
+        """
+        n = self._count
+        if n == 0:
+            return -1
+        self._updateMaxStops()
+        hi = int(np.searchsorted(self._starts[:n], position, side='right'))
+        lo = int(np.searchsorted(self._maxStops[:n], position, side='right'))
+        stops = self._stops
+        for row in range(hi - 1, lo - 1, -1):
+            if stops[row] > position:
+                return row
+        return -1
+
+    def nearestRow(self, position: int) -> int:
+        """
+        Get the row of the cue containing position, or else of the cue
+        ending or starting closest to it, -1 if the store is empty.
+        """
+        row = self.cueAt(position)
+        if row >= 0 or self._count == 0:
+            return row
+        before = self.previousStart(position + 1)
+        after = before + 1
+        if before < 0:
+            return after
+        if after >= self._count:
+            return before
+        if position - self._stops[before] <= self._starts[after] - position:
+            return before
+        return after
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._starts)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        starts = np.empty(capacity, dtype=np.int64)
+        stops = np.empty(capacity, dtype=np.int64)
+        maxStops = np.empty(capacity, dtype=np.int64)
+        spans = np.empty((capacity, 2), dtype=np.int64)
+        starts[:self._count] = self.starts
+        stops[:self._count] = self.stops
+        maxStops[:self._maxValid] = self._maxStops[:self._maxValid]
+        spans[:self._count] = self.spans
+        self._starts = starts
+        self._stops = stops
+        self._maxStops = maxStops
+        self._spans = spans
+
+    def _checkOverlap(self, row: int) -> None:
+        if 0 < row < self._count and self._starts[row] < self._stops[row - 1]:
+            self._overlaps.add(row)
+        else:
+            self._overlaps.discard(row)
+
+    def _invalidate(self, row: int) -> None:
+        self._maxValid = min(self._maxValid, row)
+        self._cursor = None
+
+    def _updateMaxStops(self) -> None:
+        valid = self._maxValid
+        n = self._count
+        if valid >= n:
+            return
+        np.maximum.accumulate(self._stops[valid:n], out=self._maxStops[valid:n])
+        if valid > 0:
+            np.maximum(self._maxStops[valid:n], self._maxStops[valid - 1], out=self._maxStops[valid:n])
+        self._maxValid = n
+
+
+class EditJournal(object):
+    """
+    Undo and redo history of edits to a cue store.
+
+    Entries are tuples describing an edit just well enough to apply it or
+    its inverse: ('offset', delta) for a shift of every cue,
+    ('insert', start, stop, text, replacedTexts), ('delete', start, stop,
+    text), ('text', start, stop, oldText, newText) and ('bulk', starts,
+    stops, texts, replacedStarts, replacedStops, replacedTexts). Cues are
+    identified by their start and stop rather than their row, so entries
+    stay valid while rows move, and ('retime', oldStarts, oldStops,
+    starts, stops) moves each cue from its old pair to its new one. The
+    oldest entries are dropped once the history holds more than maxBytes.
+    """
+    EntrySize = 64  # bytes counted per entry besides its texts and arrays
+
+    def __init__(self, maxBytes: int = 16 * 1024 * 1024):
+        self.maxBytes = maxBytes
+        self._undo = collections.deque()  # (entry, size), oldest first
+        self._redo = []
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    def nbytes(self) -> int:
+        """
+        Get the approximate memory held by the history, redo entries included.
+        """
+        return self._bytes
+
+    def canUndo(self) -> bool:
+        return len(self._undo) > 0
+
+    def canRedo(self) -> bool:
+        return len(self._redo) > 0
+
+    def record(self, entry: tuple) -> None:
+        """
+        Add an edit that has just been applied. Anything undone is forgotten.
+        """
+        self._bytes -= sum([size for _, size in self._redo])
+        self._redo = []
+        self._push(self._undo, entry)
+        self._trim()
+
+    def undo(self):
+        """
+        Take the latest edit for undoing, None if there is none.
+        """
+        if len(self._undo) == 0:
+            return None
+        entry, size = self._undo.pop()
+        self._redo.append((entry, size))
+        return entry
+
+    def redo(self):
+        """
+        Take the latest undone edit for applying again, None if there is none.
+        """
+        if len(self._redo) == 0:
+            return None
+        entry, size = self._redo.pop()
+        self._undo.append((entry, size))
+        return entry
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo = []
+        self._bytes = 0
+
+    @staticmethod
+    def apply(editor, entry: tuple, inverse: bool = False) -> None:
+        """
+        Apply an entry, or its inverse, through editor: an object with a
+        cues store and replaceCue, removeCues, extendCues, shiftCues,
+        moveCues and setCueText methods, such as CueEditor.
+        """
+        kind = entry[0]
+        cues = editor.cues
+        if kind == 'offset':
+            editor.shiftCues(-entry[1] if inverse else entry[1])
+        elif kind == 'insert':
+            _, start, stop, text, replaced = entry
+            if inverse:
+                editor.removeCues(cues.findRows(start, stop))
+                for oldText in replaced:
+                    editor.replaceCue(start, stop, oldText)
+            else:
+                editor.replaceCue(start, stop, text)
+        elif kind == 'delete':
+            _, start, stop, text = entry
+            if inverse:
+                editor.replaceCue(start, stop, text)
+            else:
+                editor.removeCues(cues.findRows(start, stop))
+        elif kind == 'text':
+            _, start, stop, oldText, newText = entry
+            for row in cues.findRows(start, stop).tolist():
+                editor.setCueText(row, oldText if inverse else newText)
+        elif kind == 'bulk':
+            _, starts, stops, texts, oldStarts, oldStops, oldTexts = entry
+            if inverse:
+                editor.removeCues(cues.matchRows(starts, stops))
+                editor.extendCues(oldStarts, oldStops, oldTexts)
+            else:
+                editor.extendCues(starts, stops, texts)
+        elif kind == 'retime':
+            _, oldStarts, oldStops, starts, stops = entry
+            if inverse:
+                editor.moveCues(starts, stops, oldStarts, oldStops)
+            else:
+                editor.moveCues(oldStarts, oldStops, starts, stops)
+        else:
+            raise ValueError('EditJournal::apply(): Unknown edit %r' % (kind))
+
+    def _push(self, stack, entry: tuple) -> None:
+        size = self.EntrySize
+        for value in entry[1:]:
+            if isinstance(value, np.ndarray):
+                size += value.nbytes
+            elif isinstance(value, str):
+                size += sys.getsizeof(value)
+            elif isinstance(value, (list, tuple)):
+                size += sys.getsizeof(value) + sum([sys.getsizeof(item) for item in value])
+        stack.append((entry, size))
+        self._bytes += size
+
+    def _trim(self) -> None:
+        while self._bytes > self.maxBytes and len(self._undo) > 0:
+            _, size = self._undo.popleft()
+            self._bytes -= size
+
+
+class CueEditor(object):
+    """
+    The edits EditJournal.apply needs, on a bare cue store.
+    """
+
+    def __init__(self, cues: CueStore):
+        self.cues = cues
+
+    def replaceCue(self, start: int, stop: int, text: str) -> list:
+        rows = self.cues.findRows(start, stop)
+        replaced = [self.cues.text(row) for row in rows.tolist()]
+        self.removeCues(rows)
+        self.cues.insert(start, stop, text)
+        return replaced
+
+    def removeCues(self, rows) -> None:
+        self.cues.removeRows(rows)
+
+    def extendCues(self, starts, stops, texts) -> int:
+        return self.cues.extend(starts, stops, texts, replace=True)
+
+    def shiftCues(self, milliseconds: int) -> None:
+        self.cues.shift(milliseconds)
+
+    def moveCues(self, fromStarts, fromStops, starts, stops) -> None:
+        self.cues.moveCues(fromStarts, fromStops, starts, stops)
+
+    def setCueText(self, row: int, text: str) -> None:
+        self.cues.setText(row, text)
+
+
+class AutosaveJournal(object):
+    """
+    Append-only file recording the edits made to a cue store, for recovery
+    after a crash.
+
+    The file is a sequence of records, each a kind byte and a payload
+    length followed by the payload. It starts with a snapshot of the store
+    (b'S': the count, start and stop arrays, text byte offsets and the
+    UTF-8 texts), followed by edits (b'E': JSON of [inverse, *entry], see
+    EditJournal). Once the edits outgrow the snapshot, or at least
+    CompactBytes, the owner is asked to write a new snapshot, which replaces
+    the file atomically. All writing happens on a background thread, and a
+    record cut short by a crash is ignored when recovering.
+
+    Parameters:
+        fileName (str): Journal file
+        onError (callable): Called with a message, on the background thread,
+            when writing fails, once until a snapshot is written again
+    """
+    Header = struct.Struct('<cQ')
+    CompactBytes = 1024 * 1024
+
+    def __init__(self, fileName: str, onError=None):
+        self.fileName = os.path.abspath(fileName)
+        self.onError = onError
+        self.error = None  # the last write error, if any
+        self._reported = False
+        self._snapshotBytes = 0
+        self._editBytes = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='AutosaveJournal', daemon=True)
+        self._thread.start()
+
+    def snapshot(self, starts, stops, texts) -> None:
+        """
+        Start the file over from the given cues. Pass copies (see CueTexts.copy),
+        they are written in the background.
+        """
+        self._editBytes = 0
+        self._snapshotBytes = 8 * 3 * len(starts)
+        self._queue.put(('snapshot', (starts, stops, texts)))
+
+    def append(self, entry: tuple, inverse: bool = False) -> None:
+        """
+        Record an edit applied to the store, or the inverse of one (an undo).
+        The entry is encoded in the background, it must not change after.
+        """
+        size = self.Header.size  # about the size of the JSON
+        for value in entry:
+            if isinstance(value, np.ndarray):
+                size += 8 * value.size
+            elif isinstance(value, str):
+                size += len(value) + 3
+            elif isinstance(value, (list, tuple)):
+                size += sum([len(item) + 3 for item in value])
+            else:
+                size += 8
+        self._editBytes += size
+        self._queue.put(('append', (entry, inverse)))
+
+    def needsSnapshot(self) -> bool:
+        return self._editBytes > max(self.CompactBytes, self._snapshotBytes)
+
+    def flush(self) -> None:
+        """
+        Wait until everything recorded so far is on disk.
+        """
+        self._queue.join()
+
+    def close(self, remove: bool = False) -> None:
+        """
+        Write what is pending and stop, removing the file if remove is set.
+        """
+        self._queue.put(('close', remove))
+        self._thread.join()
+
+    @classmethod
+    def recover(cls, fileName: str):
+        """
+        Rebuild the cue store recorded in fileName.
+
+        Returns:
+            (cues, edits): The store and the number of edits replayed on top
+            of the snapshot, or None if the file holds no complete snapshot
+        """
+        with open(fileName, 'rb') as stream:
+            data = stream.read()
+        cues = None
+        edits = 0
+        position = 0
+        while position + cls.Header.size <= len(data):
+            kind, length = cls.Header.unpack_from(data, position)
+            position += cls.Header.size
+            if position + length > len(data):
+                break  # cut short
+            payload = memoryview(data)[position:position + length]
+            position += length
+            if kind == b'S':
+                cues = cls._decodeSnapshot(payload)
+            elif kind == b'E' and cues is not None:
+                record = json.loads(bytes(payload).decode('utf-8'))
+                EditJournal.apply(CueEditor(cues), tuple(record[1:]), record[0])
+                edits += 1
+        if cues is None:
+            return None
+        return cues, edits
+
+    @staticmethod
+    def _encodeSnapshot(starts, stops, texts) -> bytes:
+        encoded = [text.encode('utf-8') for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        return b''.join([struct.pack('<Q', len(encoded)),
+                         np.ascontiguousarray(starts, dtype='<i8').tobytes(),
+                         np.ascontiguousarray(stops, dtype='<i8').tobytes(),
+                         offsets.astype('<i8').tobytes()] + encoded)
+
+    @staticmethod
+    def _decodeSnapshot(payload) -> CueStore:
+        count, = struct.unpack_from('<Q', payload, 0)
+        arrays = np.frombuffer(payload, dtype='<i8', count=3 * count + 1, offset=8)
+        starts = arrays[:count].astype(np.int64)
+        stops = arrays[count:2 * count].astype(np.int64)
+        offsets = arrays[2 * count:]
+        # the texts stay undecoded until used, as with readMappedCueStore
+        textBase = bytes(payload[8 + 8 * (3 * count + 1):])
+        spans = np.empty((count, 2), dtype=np.int64)
+        spans[:, 0] = offsets[:-1]
+        spans[:, 1] = offsets[1:]
+        cues = CueStore(count, textBase)
+        cues.extend(starts, stops, spans=spans)
+        return cues
+
+    def _run(self) -> None:
+        stream = None
+        while True:
+            task, value = self._queue.get()
+            try:
+                if task == 'snapshot':
+                    if stream is not None:
+                        stream.close()
+                    stream = self._writeSnapshot(*value)
+                    self._reported = False
+                elif task == 'append' and stream is not None:
+                    stream.write(self._encodeEdit(*value))
+                elif task == 'close':
+                    if stream is not None:
+                        stream.close()
+                        stream = None
+                    if value and os.path.exists(self.fileName):
+                        os.remove(self.fileName)
+                    return
+                if stream is not None and self._queue.empty():
+                    stream.flush()
+                    os.fsync(stream.fileno())
+            except Exception as e:
+                self.error = e
+                msg = 'Autosave to %s failed, edits are not journalled: %s' % (self.fileName, str(e))
+                print('AutosaveJournal: %s' % (msg))
+                if self.onError is not None and not self._reported:
+                    self._reported = True
+                    self.onError(msg)
+            finally:
+                self._queue.task_done()
+
+    def _encodeEdit(self, entry: tuple, inverse: bool) -> bytes:
+        payload = json.dumps([inverse] + [value.tolist() if isinstance(value, np.ndarray) else value
+                                          for value in entry], separators=(',', ':')).encode('utf-8')
+        return self.Header.pack(b'E', len(payload)) + payload
+
+    def _writeSnapshot(self, starts, stops, texts):
+        payload = self._encodeSnapshot(starts, stops, texts)
+        directory = os.path.dirname(self.fileName)
+        fd, tmpName = tempfile.mkstemp(prefix='.%s.' % (os.path.basename(self.fileName)),
+                                       suffix='.tmp', dir=directory)
+        stream = open(fd, 'wb')
+        try:
+            stream.write(self.Header.pack(b'S', len(payload)))
+            stream.write(payload)
+            stream.flush()
+            os.fsync(stream.fileno())
+            os.replace(tmpName, self.fileName)
+        except BaseException:
+            stream.close()
+            try:
+                os.remove(tmpName)
+            except OSError:
+                pass
+            raise
+        return stream  # renamed, later edits are appended to it
@@ -0,0 +1,354 @@
+"""
+Tests of the Qt free subtitle core, run with: python -m pytest
+"""
+
+import numpy as np
+import pytest
+
+from SRTCore import (AutosaveJournal, CueEditor, CueStore, EditJournal, alignCueStarts, cueCacheName,
+                     parseSRTBatches, readCueCache, readCueStore, readMappedCueStore, readParallelCueStore,
+                     warpTimes, writeCueCache, writeSRTFile)
+
+
+def makeStore(cues: list) -> CueStore:
+    store = CueStore()
+    for start, stop, text in cues:
+        store.insert(start, stop, text)
+    return store
+
+
+def items(store: CueStore) -> list:
+    return [store.item(row) for row in range(len(store))]
+
+
+class JournalledEditor(CueEditor):
+    """
+    CueEditor recording its edits the way SRTData does.
+    """
+
+    def __init__(self, cues: CueStore, autosave: AutosaveJournal = None):
+        super(JournalledEditor, self).__init__(cues)
+        self.journal = EditJournal()
+        self.autosave = autosave
+
+    def record(self, entry: tuple, inverse: bool = False, applied: bool = False):
+        if not applied:
+            EditJournal.apply(self, entry, inverse)
+        if not inverse:
+            self.journal.record(entry)
+        if self.autosave is not None:
+            self.autosave.append(entry, inverse)
+
+    def retime(self, scale: float, offset: float, first: int = 0, last: int = None):
+        last = len(self.cues) if last is None else last
+        starts, stops = self.cues.retimed(scale, offset, first, last)
+        self.record(('retime', self.cues.starts[first:last].copy(), self.cues.stops[first:last].copy(), starts, stops))
+
+    def delete(self, row: int):
+        self.record(('delete', *self.cues.item(row)))
+
+    def insert(self, start: int, stop: int, text: str):
+        replaced = self.replaceCue(start, stop, text)
+        self.record(('insert', start, stop, text, replaced), applied=True)
+
+    def setText(self, row: int, text: str):
+        start, stop, oldText = self.cues.item(row)
+        self.record(('text', start, stop, oldText, text))
+
+    def shift(self, milliseconds: int):
+        self.record(('offset', milliseconds))
+
+    def extend(self, cues: list):
+        starts, stops, texts = [np.array([cue[i] for cue in cues]) for i in range(2)] + [[cue[2] for cue in cues]]
+        rows = self.cues.matchRows(starts, stops)
+        self.record(('bulk', starts, stops, texts, self.cues.starts[rows], self.cues.stops[rows],
+                     [self.cues.text(row) for row in rows.tolist()]))
+
+    def undo(self):
+        self.record(self.journal.undo(), True)
+
+    def redo(self):
+        entry = self.journal.redo()
+        EditJournal.apply(self, entry)
+        if self.autosave is not None:
+            self.autosave.append(entry)
+
+
+def test_retime_undo_follows_cues_with_equal_starts():
+    editor = JournalledEditor(makeStore([(1000, 2000, 'a'), (1000, 3000, 'b')]))
+    before = sorted(items(editor.cues))
+    editor.retime(1, 100)
+    editor.delete(0)
+    editor.undo()
+    editor.undo()
+    assert sorted(items(editor.cues)) == before
+    editor.redo()
+    assert sorted(items(editor.cues)) == [(1100, 2100, 'a'), (1100, 3100, 'b')]
+
+
+def test_retime_keeps_pairs_unique():
+    store = makeStore([(1000, 2000, 'a'), (1001, 2001, 'b')])
+    starts, stops = store.retimed(0.5, 0)
+    assert len(set(zip(starts.tolist(), stops.tolist()))) == 2
+    editor = JournalledEditor(store)
+    editor.retime(0.5, 0)
+    editor.delete(1)
+    editor.undo()
+    assert sorted([text for _, _, text in items(store)]) == ['a', 'b']
+    editor.undo()
+    assert items(store) == [(1000, 2000, 'a'), (1001, 2001, 'b')]
+
+
+def test_range_retime_onto_another_cue():
+    store = makeStore([(1000, 2000, 'a'), (5000, 6000, 'b')])
+    editor = JournalledEditor(store)
+    editor.retime(1, -4000, 1, 2)
+    assert len(set([(start, stop) for start, stop, _ in items(store)])) == 2
+    editor.undo()
+    assert items(store) == [(1000, 2000, 'a'), (5000, 6000, 'b')]
+
+
+def test_range_retime_passing_other_cues_resorts():
+    store = makeStore([(1000, 2000, 'a'), (3000, 4000, 'b'), (5000, 6000, 'c')])
+    editor = JournalledEditor(store)
+    editor.retime(1, 5000, 0, 1)
+    assert [text for _, _, text in items(store)] == ['b', 'c', 'a']
+    assert np.all(np.diff(store.starts) >= 0)
+    editor.undo()
+    assert items(store) == [(1000, 2000, 'a'), (3000, 4000, 'b'), (5000, 6000, 'c')]
+
+
+def test_retime_undo_fuzz():
+    rng = np.random.default_rng(0)
+    for trial in range(200):
+        cues = [(int(start), int(start) + int(length), 'cue %d' % i) for i, (start, length) in
+                enumerate(zip(rng.integers(0, 20, 8) * 500, rng.integers(1, 4, 8) * 500))]
+        cues = list({(start, stop): (start, stop, text) for start, stop, text in cues}.values())
+        editor = JournalledEditor(makeStore(cues))
+        states = [sorted(items(editor.cues))]
+        for _ in range(6):
+            if len(editor.cues) > 1 and rng.random() < 0.4:
+                editor.delete(int(rng.integers(0, len(editor.cues))))
+            else:
+                first = int(rng.integers(0, len(editor.cues)))
+                editor.retime(float(rng.choice([0.5, 1, 1.5])), float(rng.integers(-3, 4) * 500), first,
+                              int(rng.integers(first + 1, len(editor.cues) + 1)))
+            states.append(sorted(items(editor.cues)))
+        for state in reversed(states[:-1]):
+            editor.undo()
+            assert sorted(items(editor.cues)) == state, trial
+
+
+def test_retimed_rejects_bad_scale():
+    with pytest.raises(ValueError):
+        makeStore([(0, 1000, 'a')]).retimed(0, 0)
+
+
+def test_batch_rejects_cues_before_the_start(tmp_path):
+    from SRTBatch import processFile
+    fileName, outputName = str(tmp_path / 'in.srt'), str(tmp_path / 'out.srt')
+    with open(fileName, 'w', encoding='utf-8') as srtFile:
+        srtFile.write('1\n00:00:01,000 --> 00:00:02,000\na\n\n2\n00:00:05,000 --> 00:00:06,000\nb\n\n')
+    for scale, offset in [(1.0, -1500), (1.001, -1500)]:
+        result = processFile(fileName, offset, outputName, scale=scale)
+        assert 'before the start' in result['error']
+        assert result['output'] is None
+    assert processFile(fileName, -500, outputName, scale=1.001)['error'] is None
+
+
+def onsets(count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.integers(1500, 6000, count)).astype(np.float64)
+
+
+@pytest.mark.parametrize('drift', [1.002, 1.003, 1.004, 1.005, 1 / 1.005])
+@pytest.mark.parametrize('piecewise', [False, True])
+def test_align_drift_off_the_frame_rate_scales(drift, piecewise):
+    reference = onsets(2000, 1)
+    rng = np.random.default_rng(2)
+    kept = reference[rng.random(len(reference)) > 0.1]
+    starts = np.sort(np.rint(kept * drift - 4000 + rng.normal(0, 40, len(kept))))
+    anchors, targets = alignCueStarts(starts, reference, piecewise)
+    error = np.abs(warpTimes(reference * drift - 4000, anchors, targets) - reference)
+    assert np.median(error) < 50
+    assert np.percentile(error, 95) < 200
+
+
+def test_align_frame_rate_and_cut():
+    reference = onsets(2000, 3)
+    starts = (np.where(reference > reference[1200], reference - 6000, reference) + 1000) * 25 / 23.976
+    anchors, targets = alignCueStarts(starts, reference)
+    assert np.median(np.abs(warpTimes(starts, anchors, targets) - reference)) < 50
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_align_rejects_unrelated_reference(seed):
+    for piecewise in (False, True):
+        with pytest.raises(ValueError):
+            alignCueStarts(onsets(2000, 10 + seed), onsets(2000, 1), piecewise)
+
+
+def writeCues(fileName: str, count: int, bom: bool = False) -> list:
+    cues = [(1000 * i, 1000 * i + 800, 'cue %d\nline ♪' % i) for i in range(1, count + 1)]
+    with open(fileName, 'w', encoding='utf-8-sig' if bom else 'utf-8', newline='') as srtFile:
+        for i, (start, stop, text) in enumerate(cues):
+            srtFile.write('%d\r\n%s --> %s\r\n%s\r\n\r\n' % (
+                i + 1, *['%02d:%02d:%02d,%03d' % (t // 3600000, t // 60000 % 60, t // 1000 % 60, t % 1000)
+                         for t in (start, stop)], text.replace('\n', '\r\n')))
+    return cues
+
+
+@pytest.mark.parametrize('load', [
+    readMappedCueStore,
+    lambda fileName: readParallelCueStore(fileName, jobs=2, minChunkSize=1024)])
+@pytest.mark.parametrize('bom', [False, True])
+def test_save_over_the_loaded_file(tmp_path, load, bom):
+    fileName = str(tmp_path / 'cues.srt')
+    expected = writeCues(fileName, 200, bom)
+    cues, dropped = load(fileName)
+    assert dropped == 0 and items(cues) == expected
+    # nothing may be left mapped: replacing or truncating the file must not touch the texts
+    open(fileName, 'w').close()
+    assert items(cues) == expected
+    cues.insert(500, 600, 'new')
+    writeSRTFile(fileName, cues.starts, cues.stops, cues.texts)
+    assert items(load(fileName)[0]) == [(500, 600, 'new')] + expected
+
+
+def test_cache_round_trip_and_replace(tmp_path):
+    fileName = str(tmp_path / 'cues.srt')
+    expected = writeCues(fileName, 50)
+    cues, _ = readMappedCueStore(fileName)
+    cacheName = cueCacheName(str(tmp_path), fileName)
+    writeCueCache(cacheName, cues.starts, cues.stops, cues.texts, 1234)
+    cached, position = readCueCache(cacheName)
+    assert position == 1234 and items(cached) == expected
+    cached.insert(0, 100, 'edit')
+    writeCueCache(cacheName, cached.starts, cached.stops, cached.texts)
+    assert items(cached) == [(0, 100, 'edit')] + expected
+    assert items(readCueCache(cacheName)[0]) == [(0, 100, 'edit')] + expected
+
+
+def test_cache_invalidation(tmp_path):
+    fileName = str(tmp_path / 'cues.srt')
+    writeCues(fileName, 5)
+    cacheName = cueCacheName(str(tmp_path), fileName)
+    cues, _ = readMappedCueStore(fileName)
+    writeCueCache(cacheName, cues.starts, cues.stops, cues.texts)
+    writeCues(fileName, 6)
+    assert cueCacheName(str(tmp_path), fileName) != cacheName
+    with open(cacheName, 'r+b') as cacheFile:
+        cacheFile.truncate(100)
+    assert readCueCache(cacheName) is None
+    assert readCueCache(str(tmp_path / 'missing.srtcache')) is None
+
+
+def test_autosave_recovers_edits_and_undos(tmp_path):
+    fileName = str(tmp_path / 'media.mp4.srt-autosave')
+    cues = makeStore([(1000, 2000, 'a'), (3000, 4000, 'b'), (5000, 6000, 'ü\nline')])
+    autosave = AutosaveJournal(fileName)
+    autosave.snapshot(cues.starts.copy(), cues.stops.copy(), cues.texts.copy())
+    editor = JournalledEditor(cues, autosave)
+    editor.retime(1.5, -500)
+    editor.delete(1)
+    editor.retime(1, 250, 1, 2)
+    editor.undo()
+    editor.undo()
+    editor.redo()
+    autosave.close()
+    recovered, edits = AutosaveJournal.recover(fileName)
+    assert edits == 6 and items(recovered) == items(cues)
+
+
+def test_autosave_reports_write_failure_once(tmp_path):
+    messages = []
+    autosave = AutosaveJournal(str(tmp_path / 'missing' / 'media.srt-autosave'), messages.append)
+    autosave.snapshot(np.array([0]), np.array([1000]), ['a'])
+    autosave.append(('delete', 0, 1000, 'a'))
+    autosave.flush()
+    assert len(messages) == 1 and 'media.srt-autosave' in messages[0]
+    assert autosave.error is not None
+    autosave.close()
+
+
+def loaders():
+    return [lambda fileName: readCueStore(open(fileName, encoding='utf-8-sig')), readMappedCueStore,
+            lambda fileName: readParallelCueStore(fileName, jobs=2, minChunkSize=512)]
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_parsers_agree_and_round_trip(tmp_path, newline):
+    fileName = str(tmp_path / 'cues.srt')
+    cues = writeCues(fileName, 120)
+    with open(fileName, 'a', encoding='utf-8', newline='') as srtFile:
+        # out of order, a duplicate timing replacing the first, an empty and a reversed cue dropped
+        srtFile.write(newline.join(['121', '00:00:00,500 --> 00:00:00,900', 'early', '',
+                                    '122', '00:00:02,000 --> 00:00:02,800', 'replaces cue 2', '',
+                                    '123', '00:00:04,000 --> 00:00:05,000', '', '',
+                                    '124', '00:00:07,000 --> 00:00:06,000', 'reversed', '', '']))
+    if newline == '\n':
+        with open(fileName, encoding='utf-8', newline='') as srtFile:
+            data = srtFile.read().replace('\r\n', '\n')
+        with open(fileName, 'w', encoding='utf-8', newline='') as srtFile:
+            srtFile.write(data)
+    expected = sorted([(500, 900, 'early'), (2000, 2800, 'replaces cue 2')] + cues[:1] + cues[2:])
+    for load in loaders():
+        store, dropped = load(fileName)
+        assert items(store) == expected
+        assert dropped == 3
+    writeSRTFile(fileName, store.starts, store.stops, store.texts)
+    for load in loaders():
+        assert items(load(fileName)[0]) == expected
+        assert load(fileName)[1] == 0
+
+
+def test_batches_concatenate_to_the_whole_file(tmp_path):
+    fileName = str(tmp_path / 'cues.srt')
+    cues = writeCues(fileName, 300)
+    with open(fileName, encoding='utf-8') as srtFile:
+        batches = list(parseSRTBatches(srtFile, firstBatch=50, batchInterval=0))
+    assert len(batches) > 1 and len(batches[0][0]) == 50
+    assert list(zip(np.concatenate([batch[0] for batch in batches]).tolist(),
+                    np.concatenate([batch[1] for batch in batches]).tolist(),
+                    sum([list(batch[2]) for batch in batches], []))) == cues
+
+
+def test_undo_redo_every_kind_of_edit():
+    editor = JournalledEditor(makeStore([(1000, 2000, 'a'), (3000, 4000, 'b'), (5000, 6000, 'c')]))
+    edits = [lambda: editor.insert(2500, 2900, 'new'),
+             lambda: editor.insert(3000, 4000, 'replaces b'),
+             lambda: editor.setText(0, 'ä\nedited'),
+             lambda: editor.shift(-500),
+             lambda: editor.extend([(4500, 5000, 'bulk'), (500, 1500, 'replaces a'), (9000, 9500, 'last')]),
+             lambda: editor.delete(2),
+             lambda: editor.retime(2, 100, 1, 3),
+             lambda: editor.retime(0.5, 0)]
+    states = [sorted(items(editor.cues))]
+    for edit in edits:
+        edit()
+        assert sorted(items(editor.cues)) != states[-1]
+        states.append(sorted(items(editor.cues)))
+    for state in reversed(states[:-1]):
+        editor.undo()
+        assert sorted(items(editor.cues)) == state
+    assert not editor.journal.canUndo()
+    for state in states[1:]:
+        editor.redo()
+        assert sorted(items(editor.cues)) == state
+    editor.undo()
+    editor.undo()
+    editor.setText(0, 'forks')
+    assert not editor.journal.canRedo()
+    editor.undo()
+    assert sorted(items(editor.cues)) == states[-3]
+
+
+def test_batch_rejects_files_without_cues(tmp_path):
+    from SRTBatch import processFile
+    fileName, outputName = str(tmp_path / 'broken.srt'), str(tmp_path / 'out.srt')
+    with open(fileName, 'w') as srtFile:
+        srtFile.write('garbage\n')
+    result = processFile(fileName, 0, outputName)
+    assert result['error'] == 'no subtitles found' and result['output'] is None
+    open(fileName, 'w').close()
+    assert processFile(fileName, 0, outputName)['error'] is None